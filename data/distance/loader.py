@@ -1,7 +1,8 @@
 import os
 import pandas as pd
 import time
-from utils.load import project_root
+from utils.load import project_root, load_csv
+from utils.storage import save_table
 from data.distance.core import calculate_distance
 
 
@@ -66,8 +67,7 @@ def save_intermediate_csv(df, country, row_index):
 def save_to_csv(df, country, cup):
     project_root_path = project_root()
     save_path = os.path.join(project_root_path, 'data', 'process', country, f'{cup}_distance_data.csv')
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    df.to_csv(save_path, index=False)
+    save_table(df, save_path, 'distance_data', export_csv=True)
     print(f"Saved complete data to {save_path}")
 
 
@@ -75,7 +75,7 @@ def process_cup_fixtures(country, cup):
     project_root_path = project_root()
     fixtures_path = os.path.join(project_root_path, 'data', 'process', country, f'{cup}_fixtures.csv')
 
-    fixtures_data = pd.read_csv(fixtures_path)
+    fixtures_data = load_csv(fixtures_path, columns=['team_name', 'opponent_name'])
     fixtures_with_distances = calculate_distances(fixtures_data, country, cup)
     save_to_csv(fixtures_with_distances, country, cup)
     return fixtures_with_distances
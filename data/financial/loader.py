@@ -3,6 +3,7 @@ import pandas as pd
 
 from data.financial.scrape import scrape_league_data
 from utils.load import project_root, load_mappings_from_yaml
+from utils.storage import save_table
 
 
 def request_financial_data(country, cup):
@@ -34,8 +35,7 @@ def request_financial_data(country, cup):
                                'process',
                                country,
                                f'{cup}_financial_data.csv')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    financial_data.to_csv(output_path, index=False)
+    financial_data = save_table(financial_data, output_path, 'financial_data', export_csv=True)
     print(f"Saved financial data to {output_path}")
 
     return financial_data
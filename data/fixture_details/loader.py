@@ -0,0 +1,189 @@
+import os
+import re
+import glob
+import hashlib
+import logging
+import pandas as pd
+from utils.load import project_root, load_league_mappings, load_api_key
+from data.raw.client import ApiClient
+from data.raw.jobs import JobQueue, jobs_path
+from data.raw.limiter import TokenBucket
+from data.raw.loader import run_jobs, MAX_WORKERS
+from data.raw.manifest import Manifest, FINISHED_STATUSES
+from data.raw.store import read_columns
+
+# Maximum number of ids API-Football accepts in one /fixtures?ids= request
+BATCH_SIZE = 20
+
+FIXTURE_STATUS_FIELDS = {
+    'fixture_id': ('fixture', 'id'),
+    'status': ('fixture', 'status', 'short'),
+}
+
+
+def details_dir(country):
+    return os.path.join(project_root(), 'data', 'process', country, 'fixture_details')
+
+
+def batch_key(ids):
+    """
+    Name of a batch of fixture ids: its first id and a short hash of all ids, so a batch that is
+    planned again with other ids is stored and cached apart from an earlier one.
+    """
+    ids = sorted(ids)
+    digest = hashlib.sha256(','.join(str(fixture_id) for fixture_id in ids).encode('utf-8')).hexdigest()[:12]
+    return f'{ids[0]}_{digest}'
+
+
+def statistic_column(statistic_type):
+    """
+    Column name of an API statistic, e.g. 'Shots on Goal' -> 'shots_on_goal', 'Passes %' -> 'passes_pct'.
+    """
+    return re.sub(r'[^a-z0-9]+', '_', statistic_type.lower().replace('%', 'pct')).strip('_')
+
+
+def statistic_value(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return float(value.rstrip('%'))
+    return value
+
+
+def reduce_fixture_details(data_dict):
+    """
+    Reduce a /fixtures?ids= response to one row per (fixture_id, team_id) with the lineup,
+    the number of substitutions and the match statistics of the team.
+
+    Returns:
+    - pd.DataFrame: Fixture details per fixture and team.
+    """
+    rows = []
+    for fixture in data_dict.get('response') or []:
+        fixture_id = fixture['fixture']['id']
+        teams = {}
+        for side in ('home', 'away'):
+            team_id = fixture['teams'][side]['id']
+            teams[team_id] = {'fixture_id': fixture_id, 'team_id': team_id, 'team_home': side,
+                              'formation': None, 'coach_id': None, 'starting_player_ids': [],
+                              'substitutions': 0}
+
+        for lineup in fixture.get('lineups') or []:
+            team = teams.get(lineup['team']['id'])
+            if team is None:
+                continue
+            team['formation'] = lineup.get('formation')
+            team['coach_id'] = (lineup.get('coach') or {}).get('id')
+            team['starting_player_ids'] = [entry['player']['id'] for entry in lineup.get('startXI') or []]
+
+        for event in fixture.get('events') or []:
+            team = teams.get(event['team']['id'])
+            if team is not None and event.get('type') == 'subst':
+                team['substitutions'] += 1
+
+        for statistics in fixture.get('statistics') or []:
+            team = teams.get(statistics['team']['id'])
+            if team is None:
+                continue
+            for statistic in statistics.get('statistics') or []:
+                team[statistic_column(statistic['type'])] = statistic_value(statistic['value'])
+
+        rows.extend(teams.values())
+    return pd.DataFrame(rows)
+
+
+def store_fixture_details_fragment(country, league_name, season, data_dict):
+    """
+    Reduce a fixture details batch as soon as it arrives and store it as a Parquet fragment.
+    """
+    details = reduce_fixture_details(data_dict)
+    if details.empty:
+        return details
+    batch = batch_key(details['fixture_id'].unique())
+    save_path = os.path.join(details_dir(country), f"{league_name}_{season}_{batch}.parquet")
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    details.to_parquet(save_path, index=False)
+    return details
+
+
+def fetched_fixture_ids(country):
+    fetched = set()
+    for file_path in glob.glob(os.path.join(details_dir(country), '*.parquet')):
+        fetched.update(pd.read_parquet(file_path, columns=['fixture_id'])['fixture_id'].tolist())
+    return fetched
+
+
+def plan_detail_batches(country):
+    """
+    Group the finished cup and league fixtures without details into batches of BATCH_SIZE ids.
+
+    Returns:
+    - list: (league_name, league_id, season, kind, ids) tuples, the kind named after the batch key of the ids.
+    """
+    fetched = fetched_fixture_ids(country)
+    batches = []
+    for league_name, details in load_league_mappings(country).items():
+        if 'fixtures' not in details['data_types']:
+            continue
+        for season in range(details['season_start'], details['season_end'] + 1):
+            columns = read_columns(country, league_name, season, 'fixtures', FIXTURE_STATUS_FIELDS)
+            if columns is None:
+                continue
+            ids = sorted(fixture_id for fixture_id, status in zip(columns['fixture_id'], columns['status'])
+                         if status in FINISHED_STATUSES and fixture_id not in fetched)
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                batches.append((league_name, str(details['id']), str(season), f'fixture_details_{batch_key(batch)}',
+                                batch))
+    return batches
+
+
+def request_fixture_details(country, workers=MAX_WORKERS, limiter=None, client=None, manifest=None, queue=None):
+    """
+    Request lineups, events and statistics of every finished fixture of a country in batches
+    of BATCH_SIZE ids, through the same job queue, budget and client as the raw data.
+    """
+    if client is None:
+        api_key = load_api_key(os.path.join(project_root(), 'credentials', 'api_key.txt'))
+        client = ApiClient(api_key, pool_size=workers)
+    if limiter is None:
+        limiter = TokenBucket()
+    if manifest is None:
+        manifest = Manifest()
+    if queue is None:
+        queue = JobQueue(jobs_path(f'jobs_details_{country.lower()}'))
+
+    batches = plan_detail_batches(country)
+    logging.info(f"Requesting details of {sum(len(batch[4]) for batch in batches)} fixtures "
+                 f"in {len(batches)} requests.")
+    for league_name, league_id, season, kind, ids in batches:
+        queue.add(country, league_name, league_id, season, kind, params={'ids': ids})
+
+    return run_jobs(queue, client, limiter, manifest, workers,
+                    reducers={'fixture_details': store_fixture_details_fragment},
+                    name=f'ingestion_details_{country.lower()}')
+
+
+def construct_fixture_details(country):
+    """
+    Combine all fixture details fragments of a country into one table.
+    """
+    fragments = [pd.read_parquet(file_path) for file_path in sorted(glob.glob(os.path.join(details_dir(country),
+                                                                                           '*.parquet')))]
+    if not fragments:
+        print(f"No fixture details available for {country}")
+        return None
+
+    fixture_details = (pd.concat(fragments, ignore_index=True)
+                       .drop_duplicates(subset=['fixture_id', 'team_id'], keep='last')
+                       .sort_values(by=['fixture_id', 'team_home'], ascending=[True, False])
+                       .reset_index(drop=True))
+    fixture_details.to_parquet(os.path.join(project_root(), 'data', 'process', country, 'fixture_details.parquet'),
+                               index=False)
+    return fixture_details
+
+
+if __name__ == "__main__":
+    country = 'Germany'
+    request_fixture_details(country)
+    print(construct_fixture_details(country))
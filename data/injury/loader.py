@@ -1,102 +1,101 @@
 import os
-import http.client
-import json
-import time
-import yaml
-from collections import defaultdict
-import ssl
-import certifi
-
-
-def get_project_root():
-    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-
-def load_mappings_from_yaml(filename):
-    file_path = os.path.join(get_project_root(), filename)
-    with open(file_path, 'r') as file:
-        mappings = yaml.safe_load(file)
-    return mappings
-
-
-def load_league_mappings(country):
-    with open(os.path.join(get_project_root(), 'settings', f'mapping_{country.lower()}.yaml'), 'r') as file:
-        league_mappings = yaml.safe_load(file)
-    return league_mappings.get(country)
-
-
-
-def request_data(country, league_name, league_id, season, request_counter, start_time):
-    if request_counter >= 10:
-        elapsed_time = time.time() - start_time
-        if elapsed_time < 60:
-            print(f"Rate limit approached, sleeping for {60 - elapsed_time} seconds")
-            time.sleep(60 - elapsed_time)
-        request_counter = 0
-        start_time = time.time()
-
-    # Adjusted to use the project root for directory paths
-    directory_path = os.path.join(get_project_root(), 'raw', country, league_name, str(season))
-    file_path = os.path.join(directory_path, 'injuries_data.json')
-
-    if os.path.isfile(file_path):
-        with open(file_path, 'r') as file:
-            data_dict = json.load(file)
-        print(f"Loaded data from existing file for {country} {league_name} {season}.")
-    else:
-        context = ssl.create_default_context(cafile=certifi.where())
-        conn = http.client.HTTPSConnection("v3.football.api-sports.io", context=context)
-        headers = {
-            'x-rapidapi-host': "v3.football.api-sports.io",
-            'x-rapidapi-key': "483cf201220068a29dbebab0fed58226"  # Replace with your actual API key
-        }
-        conn.request("GET", f"/injuries?league={league_id}&season={season}", headers=headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        data_dict = json.loads(data.decode("utf-8"))
-
-        os.makedirs(directory_path, exist_ok=True)
-
-        with open(file_path, 'w') as file:
-            json.dump(data_dict, file, indent=4)
-        print(f"Requested new data and saved to file for {country} {league_name} {season}.")
-
-    request_counter += 1
-    return data_dict, request_counter, start_time
-
-
-def aggregate_missed_fixtures_per_team(data):
-    missed_fixtures_per_team = defaultdict(int)
-    for entry in data:
-        if entry['player']['type'] == "Missing Fixture":
-            team_name = entry['team']['name']
-            missed_fixtures_per_team[team_name] += 1
-    return missed_fixtures_per_team
+import pandas as pd
+from utils.load import project_root, load_league_mappings
+from data.raw.store import read_raw
+from utils.storage import save_table
+
+
+def injury_fragment_path(country, league_name, season):
+    return os.path.join(project_root(), 'data', 'process', country, 'injuries', f'{league_name}_{season}.csv')
+
+
+def reduce_injuries(data_dict, season):
+    """
+    Reduce an /injuries response to one row per (team_id, fixture_id) with the number of
+    players missing the fixture and the number of questionable players.
+
+    Returns:
+    - pd.DataFrame: Injuries per team and fixture.
+    """
+    entries = data_dict.get('response') or []
+    columns = pd.DataFrame({
+        'team_id': [entry['team']['id'] for entry in entries],
+        'team_name': [entry['team']['name'] for entry in entries],
+        'fixture_id': [entry['fixture']['id'] for entry in entries],
+        'fixture_date': [entry['fixture']['date'] for entry in entries],
+        'player_type': [entry['player']['type'] for entry in entries],
+    })
+
+    injuries = (columns
+                .assign(missing_players=lambda df: (df['player_type'] == 'Missing Fixture').astype(int),
+                        questionable_players=lambda df: (df['player_type'] == 'Questionable').astype(int))
+                .groupby(['team_id', 'team_name', 'fixture_id', 'fixture_date'], as_index=False)
+                [['missing_players', 'questionable_players']].sum())
+    injuries.insert(0, 'year', int(season))
+    return injuries
+
+
+def store_injury_fragment(country, league_name, season, data_dict):
+    """
+    Reduce an /injuries response as soon as it arrives and store it as a per league-season fragment.
+    """
+    injuries = reduce_injuries(data_dict, season)
+    save_path = injury_fragment_path(country, league_name, season)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    injuries.to_csv(save_path, index=False)
+    return injuries
+
+
+def aggregate_injuries_per_season(injuries):
+    """
+    Aggregate fixture level injuries to one row per (team_id, year).
+    """
+    return (injuries
+            .groupby(['year', 'team_id'], as_index=False)
+            .agg(injury_fixtures=('fixture_id', 'nunique'),
+                 missing_players_season=('missing_players', 'sum'),
+                 questionable_players_season=('questionable_players', 'sum')))
+
+
+def construct_injury_data(country):
+    """
+    Combine the injury fragments of all leagues and cups of a country into a per team-fixture
+    and a per team-season table. Fragments missing for stored responses are reduced from the raw store.
+    """
+    leagues = load_league_mappings(country)
+    fragments = []
+
+    for league_name, details in leagues.items():
+        if 'injuries' not in details['data_types']:
+            continue
+        season_start = details.get('injuries_start', details['season_start'])
+        for season in range(season_start, details['season_end'] + 1):
+            fragment_path = injury_fragment_path(country, league_name, season)
+            if os.path.isfile(fragment_path):
+                fragments.append(pd.read_csv(fragment_path))
+                continue
+            data_dict = read_raw(country, league_name, season, 'injuries')
+            if data_dict is not None:
+                fragments.append(store_injury_fragment(country, league_name, season, data_dict))
+
+    if not fragments:
+        print(f"No injury data available for {country}")
+        return None, None
+
+    injuries_fixture = (pd.concat(fragments, ignore_index=True)
+                        .groupby(['year', 'team_id', 'fixture_id'], as_index=False)
+                        .agg(fixture_date=('fixture_date', 'first'),
+                             missing_players=('missing_players', 'sum'),
+                             questionable_players=('questionable_players', 'sum')))
+    injuries_season = aggregate_injuries_per_season(injuries_fixture)
+
+    save_dir = os.path.join(project_root(), 'data', 'process', country)
+    injuries_fixture = save_table(injuries_fixture, os.path.join(save_dir, 'injuries_fixture.csv'), 'injuries_fixture')
+    injuries_season = save_table(injuries_season, os.path.join(save_dir, 'injuries_season.csv'), 'injuries_season')
+    return injuries_fixture, injuries_season
 
 
 if __name__ == "__main__":
     country = 'Germany'
-
-    mappings = load_mappings_from_yaml(os.path.join('settings', f'mapping_{country.lower()}.yaml'))
-
-    request_counter = 0
-    start_time = time.time()
-
-    all_missed_fixtures_per_team_season = defaultdict(lambda: defaultdict(int))
-
-    for league_name, config in mappings[country].items():
-        league_id = config['id']
-
-        for season in range(2010, 2023):
-            print(f"Processing {league_name} for the {season} season.")
-            result, request_counter, start_time = request_data(country, league_name, str(league_id), str(season),
-                                                               request_counter, start_time)
-            missed_fixtures_per_team = aggregate_missed_fixtures_per_team(result['response'])
-            for team, count in missed_fixtures_per_team.items():
-                all_missed_fixtures_per_team_season[team][season] += count
-
-    # Print the total number of missed fixtures per team per season
-    for team, seasons in all_missed_fixtures_per_team_season.items():
-        for season, missed_count in seasons.items():
-            print(f"{team} - {season}: {missed_count} missed fixtures")
+    injuries_fixture, injuries_season = construct_injury_data(country)
+    print(injuries_season)
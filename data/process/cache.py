@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from utils.load import project_root
+from data.raw.store import raw_path, legacy_path, read_raw, read_columns
+
+# Bump when a parser changes the shape of the fragments it produces
+CACHE_VERSION = 3
+
+
+def fragment_path(country, league, season, name):
+    return os.path.join(project_root(), 'data', 'process', country, 'cache', league, f'{season}_{name}.parquet')
+
+
+def source_key(country, league, season, kind, params=None):
+    """
+    Identify the raw file a fragment was parsed from by its modification time and size, so
+    checking a fragment never has to read the raw file itself. `params` are the parser settings
+    that also shape the fragment, e.g. the rounds to stages mapping of a cup.
+
+    Returns:
+    - dict or None: The key, None if no raw file is stored.
+    """
+    file_path = raw_path(country, league, season, kind)
+    if not os.path.isfile(file_path):
+        file_path = legacy_path(country, league, season, kind)
+        if not os.path.isfile(file_path):
+            return None
+    stat = os.stat(file_path)
+    params_hash = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return {'source': os.path.basename(file_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'params': params_hash, 'version': CACHE_VERSION}
+
+
+def load_fragment(country, league, season, kind, name, parse, params=None, fields=None):
+    """
+    Return the parsed frame of one raw league-season file. The raw file is parsed with
+    `parse(data_dict)` only when no fragment exists for its current key; otherwise the typed
+    Parquet fragment is read. With `fields` the raw file is streamed and `parse` receives
+    only those columns (see `read_columns`) instead of the full response.
+
+    Returns:
+    - pd.DataFrame or None: The parsed frame, None if no raw file is stored.
+    """
+    key = source_key(country, league, season, kind, params)
+    if key is None:
+        return None
+
+    file_path = fragment_path(country, league, season, name)
+    key_path = f'{file_path}.json'
+    if os.path.isfile(file_path) and os.path.isfile(key_path):
+        with open(key_path, 'r') as file:
+            if json.load(file) == key:
+                return pd.read_parquet(file_path)
+
+    if fields is None:
+        fragment = parse(read_raw(country, league, season, kind))
+    else:
+        fragment = parse(read_columns(country, league, season, kind, fields))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    fragment.to_parquet(file_path, index=False)
+    with open(key_path, 'w') as file:
+        json.dump(key, file)
+    return fragment
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.load import project_root
+from utils.storage import save_table
+from data.process.data_cup import load_cup_fixtures
+from data.process.data_league import load_league_fixtures
+from data.process.team_calendar import TeamCalendar
+
+# Lengths in days of the windows before and after a fixture that congestion is counted over
+WINDOWS = (7, 14, 28)
+
+# League fixtures have no recorded length and never go to extra time
+LEAGUE_MINUTES = 90
+
+DAY = 24 * 3600 * 10 ** 9
+
+
+def congestion_features(calendar, minutes, windows=WINDOWS):
+    """
+    Congestion around every fixture of a calendar: the matches and minutes the team played in the
+    `w` days before it (`matches_last_{w}d`, `minutes_last_{w}d`) and plays in the `w` days after it
+    (`matches_next_{w}d`, `minutes_next_{w}d`), not counting the fixture itself, and the days of
+    rest before and after it (`rest_days_prev`, `rest_days_next`).
+
+    Every window is two binary searches per fixture on the sorted calendar and the minutes are
+    differences of one cumulative sum, so no fixture is compared with any other.
+
+    Returns:
+    - pd.DataFrame: One row per calendar entry, in calendar order.
+    """
+    positions = np.arange(len(calendar))
+    played = np.concatenate([[0], np.cumsum(minutes)])
+    features = {}
+    for window in windows:
+        first, _, _ = calendar.bounds(calendar.team_ids, calendar.dates - window * DAY, 'left')
+        end, _, _ = calendar.bounds(calendar.team_ids, calendar.dates + window * DAY, 'right')
+        features[f'matches_last_{window}d'] = positions - first
+        features[f'minutes_last_{window}d'] = played[positions] - played[first]
+        features[f'matches_next_{window}d'] = end - positions - 1
+        features[f'minutes_next_{window}d'] = played[end] - played[positions + 1]
+
+    # Entries of one team are adjacent, so the previous and next fixture are the neighbouring entries
+    same_team_prev = np.concatenate([[False], calendar.team_ids[1:] == calendar.team_ids[:-1]])
+    same_team_next = np.concatenate([calendar.team_ids[:-1] == calendar.team_ids[1:], [False]])
+    gaps = np.diff(calendar.dates) / DAY
+    features['rest_days_prev'] = np.where(same_team_prev, np.concatenate([[np.nan], gaps]), np.nan)
+    features['rest_days_next'] = np.where(same_team_next, np.concatenate([gaps, [np.nan]]), np.nan)
+    return pd.DataFrame(features)
+
+
+def construct_congestion_data(country, cup, windows=WINDOWS):
+    """
+    Congestion features of every league and cup fixture of a country, from the view of each team,
+    saved as {cup}_congestion in data/process.
+
+    Returns:
+    - pd.DataFrame: Fixture identifiers and congestion features, one row per team and fixture.
+    """
+    frames = {
+        'league': load_league_fixtures(country, columns=['year', 'fixture_date', 'team_id', 'opponent_id']),
+        cup: load_cup_fixtures(country, cup)[['year', 'fixture_date', 'team_id', 'opponent_id', 'fixture_length']],
+    }
+    calendar = TeamCalendar.from_frames(frames)
+
+    # Fixtures in calendar order; a fixture without a recorded length counts as a full league match
+    fixtures = pd.concat([frame.assign(competition=name) for name, frame in frames.items()], ignore_index=True)
+    fixtures['fixture_length'] = fixtures['fixture_length'].fillna(LEAGUE_MINUTES)
+    offsets = np.cumsum([0] + [len(frame) for frame in frames.values()])
+    fixtures = fixtures.iloc[offsets[calendar.competitions] + calendar.rows].reset_index(drop=True)
+
+    features = congestion_features(calendar, fixtures['fixture_length'].to_numpy(dtype='int64'), windows)
+    congestion = pd.concat([fixtures[['competition', 'year', 'fixture_date', 'team_id', 'opponent_id']],
+                            features], axis=1)
+
+    save_path = os.path.join(project_root(), 'data', 'process', country, f'{cup}_congestion.csv')
+    return save_table(congestion, save_path, 'congestion')
+
+
+if __name__ == "__main__":
+    country = 'Germany'
+    cup = 'DFB_Pokal'
+    congestion_data = construct_congestion_data(country, cup)
+
+    print(congestion_data[congestion_data['competition'] == cup].head())
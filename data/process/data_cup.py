@@ -1,66 +1,73 @@
 from utils.load import project_root, load_mappings_from_yaml
+from data.process.cache import load_fragment
+from data.process.fixtures import (SIDE, team_perspective, winner_flag, source_columns, compact_fixtures,
+                                   save_matches, load_matches)
+from data.process.parallel import map_seasons, BUILD_WORKERS
+from data.raw.store import FIXTURE_FIELDS
+from utils.storage import save_csv
 import os
-import json
 import pandas as pd
 
 
-def process_season_fixtures(fixtures_data, season, stages):
-    season_matches = []
-    for fixture in fixtures_data['response']:
-        round_name = fixture['league']['round']
+CUP_FIXTURE_COLUMNS = {
+    'year': 'year',
+    'round': 'round',
+    'stage': 'stage',
+    'fixture_id': 'fixture_id',
+    'fixture_date': 'fixture_date',
+    'team_name': '{team}_name',
+    'team_id': '{team}_id',
+    'opponent_name': '{opponent}_name',
+    'opponent_id': '{opponent}_id',
+    'team_win': '{team}_win',
+    'team_home': SIDE,
+    'fixture_length': 'fixture_length',
+    'fixture_location': 'venue_name',
+}
 
-        # Only proceed if the round is in the stages mapping
-        if round_name not in stages:
-            continue
 
-        stage_number = stages[round_name]
+def process_season_fixtures(fixtures, season, stages):
+    fixtures = pd.DataFrame(fixtures)
+    if fixtures.empty:
+        return pd.DataFrame()
 
-        home_winner = fixture['teams']['home'].get('winner')
-        away_winner = fixture['teams']['away'].get('winner')
+    # Only proceed with the rounds in the stages mapping
+    fixtures = fixtures[fixtures['round'].isin(list(stages))].reset_index(drop=True)
+    if fixtures.empty:
+        return pd.DataFrame()
 
-        home_team_win = int(home_winner) if home_winner is not None else None
-        away_team_win = int(away_winner) if away_winner is not None else None
+    fixtures['year'] = season
+    fixtures['stage'] = fixtures['round'].map(stages)
+    for side in ('home', 'away'):
+        fixtures[f'{side}_win'] = winner_flag(fixtures[f'{side}_winner'])
 
-        match_data_home = construct_fixtures_data(season, round_name, stage_number, fixture, 'home', home_team_win)
-        match_data_away = construct_fixtures_data(season, round_name, stage_number, fixture, 'away', away_team_win)
+    return fixtures[source_columns(CUP_FIXTURE_COLUMNS)]
 
-        season_matches.append(match_data_home)
-        season_matches.append(match_data_away)
 
-    return season_matches
-
-
-def construct_fixtures_data(season, round_name, stage_number, fixture, team_type, team_win):
-    team_key = 'home' if team_type == 'home' else 'away'
-    opponent_key = 'away' if team_type == 'home' else 'home'
-
-    venue_name = fixture['fixture']['venue']['name']
-
-    return {
-        'year': season,
-        'round': round_name,
-        'stage': stage_number,
-        'fixture_id': fixture['fixture']['id'],
-        'fixture_date': fixture['fixture']['date'],
-        'team_name': fixture['teams'][team_key]['name'],
-        'team_id': fixture['teams'][team_key]['id'],
-        'opponent_name': fixture['teams'][opponent_key]['name'],
-        'opponent_id': fixture['teams'][opponent_key]['id'],
-        'team_win': team_win,
-        'team_home': team_type,
-        'fixture_length': fixture['fixture']['status']['elapsed'],
-        'fixture_location': venue_name,
-    }
+def load_season_fixtures(country, cup, season, stages):
+    """
+    Cup fixtures of one season, one row per fixture, parsed once and then read from the fragment cache.
+    """
+    return load_fragment(country, cup, season, 'fixtures', 'cup_fixtures',
+                         lambda data: process_season_fixtures(data, season, stages),
+                         params=stages, fields=FIXTURE_FIELDS)
 
 
 def save_to_csv(df, country, cup):
     project_root_path = project_root()
     save_path = os.path.join(project_root_path, 'data', 'process', country, f'{cup}_fixtures.csv')
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    df.to_csv(save_path, index=False)
+    save_csv(df, save_path)
+    return df
 
 
-def construct_cup_data(country, cup):
+def load_cup_fixtures(country, cup):
+    """
+    Team-centric view of the compact cup fixtures: two rows per fixture, one from each side.
+    """
+    return team_perspective(load_matches(country, cup), CUP_FIXTURE_COLUMNS)
+
+
+def construct_cup_data(country, cup, workers=BUILD_WORKERS):
     mappings_file = os.path.join('settings', f'mapping_{country.lower()}.yaml')
     mappings = load_mappings_from_yaml(mappings_file)
     league_info = mappings.get(cup)
@@ -71,25 +78,22 @@ def construct_cup_data(country, cup):
     season_end = league_info['season_end']
     stages = league_info['rounds']
 
-    all_fixtures = []
-    project_root_path = project_root()
-
-    for season in range(season_start, season_end + 1):
-        season_path = os.path.join(project_root_path, 'data', 'raw', country, cup, str(season), 'fixtures_data.json')
-        if os.path.isfile(season_path):
-            with open(season_path, 'r') as file:
-                fixtures_data = json.load(file)
-                all_fixtures.extend(process_season_fixtures(fixtures_data, season, stages))
+    tasks = [(country, cup, season, stages) for season in range(season_start, season_end + 1)]
+    all_fixtures = [season_fixtures for season_fixtures in map_seasons(load_season_fixtures, tasks, workers)
+                    if season_fixtures is not None]
 
-    cup_fixtures = pd.DataFrame(all_fixtures)
+    cup_matches = pd.concat(all_fixtures, ignore_index=True)
 
     # Remove fixtures without a winner, then there will be a replay.
-    cup_fixtures = cup_fixtures.dropna(subset=['team_win'])
+    cup_matches = cup_matches.dropna(subset=['home_win', 'away_win'])
 
     # Only keep fixtures that are random based on mapping
     start_round = mappings[cup]['start_round']
-    cup_fixtures = cup_fixtures[cup_fixtures['stage'] <= start_round]
+    cup_matches = compact_fixtures(cup_matches[cup_matches['stage'] <= start_round], CUP_FIXTURE_COLUMNS)
+    save_matches(cup_matches, country, cup)
 
+    # The team-centric view is only exported as CSV for the scripts that read it; the fixtures are stored once
+    cup_fixtures = team_perspective(cup_matches, CUP_FIXTURE_COLUMNS)
     save_to_csv(cup_fixtures, country, cup)
     print(cup_fixtures['year'].max())
 
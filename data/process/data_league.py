@@ -1,7 +1,12 @@
 import os
-import json
 import pandas as pd
 from utils.load import project_root, load_league_mappings
+from data.process.cache import load_fragment
+from data.process.fixtures import (team_perspective, winner_flag, match_points, source_columns, compact_fixtures,
+                                   save_matches, load_matches)
+from data.process.parallel import map_seasons, BUILD_WORKERS
+from data.raw.store import FIXTURE_FIELDS
+from utils.storage import save_table, save_csv
 
 
 def process_standings_data(entry, league, division, season):
@@ -23,120 +28,168 @@ def process_standings_data(entry, league, division, season):
     }
 
 
-def calculate_offsets(df):
-    offsets = {}
-    for Year in df['year'].unique():
-        max_position = 0
-        for division in sorted(df[df['year'] == Year]['division'].unique()):
-            offsets[(Year, division)] = max_position
-            max_position += df[(df['year'] == Year) & (df['division'] == division)]['position'].max()
-    return offsets
-
-
-def calculate_national_rank(df):
-    df = df.sort_values(by=['year', 'division', 'position'])
-    offsets = calculate_offsets(df)
-    df['national_rank'] = df.apply(lambda row: row['position'] + offsets[(row['year'], row['division'])], axis=1)
+def process_season_standings(standings_data, league, division, season):
+    if standings_data['response'] and standings_data['response'][0]['league']['standings']:
+        return pd.DataFrame([process_standings_data(entry, league, division, season)
+                             for entry in standings_data['response'][0]['league']['standings'][0]])
+    print(f"No standings data available for {league} in season {season}")
+    return pd.DataFrame()
+
+
+# Orders of the teams within a division: 'position' keeps the rank reported by the API, the other
+# variants re-rank on points with the listed tiebreakers
+TIEBREAKS = {
+    'position': None,
+    'goal_difference': ['points', 'goals_diff', 'goals_for'],
+    'goals_scored': ['points', 'goals_for', 'goals_diff'],
+}
+
+
+def calculate_offsets(division_rank, year, division):
+    """
+    Number of teams above each division of a year: the summed size of the higher divisions
+    of that year. Divisions are taken per year, so the pyramid may differ between years.
+
+    Returns:
+    - pd.Series: Offset per (year, division).
+    """
+    sizes = division_rank.groupby([year, division]).max()
+    return sizes.groupby(level=0).cumsum() - sizes
+
+
+def calculate_national_rank(df, tiebreak='position'):
+    keys = TIEBREAKS[tiebreak]
+    if keys is None:
+        df = df.sort_values(by=['year', 'division', 'position'])
+        division_rank = df['position']
+    else:
+        df = df.sort_values(by=['year', 'division'] + keys + ['position'],
+                            ascending=[True, True] + [False] * len(keys) + [True])
+        division_rank = df.groupby(['year', 'division']).cumcount() + 1
+
+    offsets = calculate_offsets(division_rank, df['year'], df['division'])
+    rows = pd.MultiIndex.from_arrays([df['year'], df['division']])
+    df['national_rank'] = division_rank.to_numpy() + offsets.reindex(rows).to_numpy()
     return df.sort_values(by=['year', 'national_rank']).reset_index(drop=True)
 
 
-def save_to_csv(df, country, filename):
+def save_to_csv(df, country, filename, export_csv=True):
+    """
+    Save a league table as typed Parquet under the name of its CSV and, with `export_csv`, as CSV.
+    """
     save_path = os.path.join(project_root(), 'data', 'process', country, filename)
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    df.to_csv(save_path, index=False)
+    return save_table(df, save_path, os.path.splitext(filename)[0], export_csv)
+
 
+def load_season_standings(country, league, division, season):
+    """
+    Standings of one league-season, parsed once and then read from the fragment cache.
+    """
+    return load_fragment(country, league, season, 'standings', 'standings',
+                         lambda data: process_season_standings(data, league, division, season),
+                         params=division)
 
-def compile_standings(country):
+
+def compile_standings(country, workers=BUILD_WORKERS, tiebreak='position'):
     leagues = load_league_mappings(country)
-    all_standings = []
+    tasks = []
 
     for league, details in leagues.items():
         if 'standings' in details['data_types']:
             for season in range(details['season_start'], details['season_end'] + 1):
-                standings_path = os.path.join(project_root(), 'data', 'raw', country, league, str(season),
-                                              'league_data.json')
-                if os.path.isfile(standings_path):
-                    with open(standings_path, 'r') as file:
-                        standings_data = json.load(file)
-                        if standings_data['response'] and standings_data['response'][0]['league']['standings']:
-                            for entry in standings_data['response'][0]['league']['standings'][0]:
-                                standings_info = process_standings_data(entry, league, details['division'], season)
-                                all_standings.append(standings_info)
-                        else:
-                            print(f"No standings data available for {league} in season {season}")
-
-    df_standings = pd.DataFrame(all_standings)
-    df_final = calculate_national_rank(df_standings)
-    save_to_csv(df_final, country, 'league_standings.csv')
-    return df_final
-
-
-def construct_match_data(season, round_name, fixture, team_type, team_win):
-    team_key = 'home' if team_type == 'home' else 'away'
-    opponent_key = 'away' if team_type == 'home' else 'home'
-
-    return {
-        'year': season,
-        'fixture_date': fixture['fixture']['date'],
-        'league': fixture['league']['name'],
-        'round': round_name,
-        'fixture_location': fixture['fixture']['venue']['city'],
-        'team_name': fixture['teams'][team_key]['name'],
-        'team_id': fixture['teams'][team_key]['id'],
-        'opponent_name': fixture['teams'][opponent_key]['name'],
-        'opponent_id': fixture['teams'][opponent_key]['id'],
-        'team_win': team_win,
-        'team_goals': fixture['goals'][team_key],
-        'opponent_goals': fixture['goals'][opponent_key],
-    }
-
-
-def process_season_fixtures(fixtures_data, season):
-    season_matches = []
-    for fixture in fixtures_data['response']:
-        round_name = fixture['league']['round']
-
-        home_winner = fixture['teams']['home'].get('winner')
-        away_winner = fixture['teams']['away'].get('winner')
-
-        home_team_win = int(home_winner) if home_winner is not None else None
-        away_team_win = int(away_winner) if away_winner is not None else None
-
-        match_data_home = construct_match_data(season, round_name, fixture, 'home', home_team_win)
-        match_data_away = construct_match_data(season, round_name, fixture, 'away', away_team_win)
+                tasks.append((country, league, details['division'], season))
 
-        season_matches.append(match_data_home)
-        season_matches.append(match_data_away)
+    all_standings = [season_standings for season_standings in map_seasons(load_season_standings, tasks, workers)
+                     if season_standings is not None]
 
-    return season_matches
+    df_standings = pd.concat(all_standings, ignore_index=True)
+    df_final = calculate_national_rank(df_standings, tiebreak)
+    save_to_csv(df_final, country, 'league_standings.csv')
+    return df_final
 
 
-def compile_fixtures(country):
+LEAGUE_FIXTURE_COLUMNS = {
+    'year': 'year',
+    'fixture_date': 'fixture_date',
+    'league': 'league_name',
+    'round': 'round',
+    'fixture_location': 'venue_city',
+    'team_name': '{team}_name',
+    'team_id': '{team}_id',
+    'opponent_name': '{opponent}_name',
+    'opponent_id': '{opponent}_id',
+    'team_win': '{team}_win',
+    'team_goals': '{team}_goals',
+    'opponent_goals': '{opponent}_goals',
+    'team_points_match': '{team}_points',
+}
+
+
+def process_season_fixtures(fixtures, season):
+    fixtures = pd.DataFrame(fixtures)
+    if fixtures.empty:
+        return pd.DataFrame()
+
+    fixtures['year'] = season
+    for side in ('home', 'away'):
+        fixtures[f'{side}_win'] = winner_flag(fixtures[f'{side}_winner'])
+        fixtures[f'{side}_points'] = match_points(fixtures[f'{side}_win'])
+
+    return fixtures[source_columns(LEAGUE_FIXTURE_COLUMNS)]
+
+
+def load_season_fixtures(country, league, season):
+    """
+    Fixtures of one league-season, one row per fixture, parsed once and then read from the fragment cache.
+    """
+    return load_fragment(country, league, season, 'fixtures', 'league_fixtures',
+                         lambda data: process_season_fixtures(data, season),
+                         fields=FIXTURE_FIELDS)
+
+
+def load_league_fixtures(country, columns=None):
+    """
+    Team-centric view of the compact league fixtures: two rows per fixture, one from each side.
+    With `columns` only those view columns are built and only their sources are read.
+    """
+    if columns is not None:
+        view_columns = {name: LEAGUE_FIXTURE_COLUMNS[name] for name in columns}
+    else:
+        view_columns = LEAGUE_FIXTURE_COLUMNS
+    return team_perspective(load_matches(country, 'league', source_columns(view_columns)), view_columns)
+
+
+def compile_fixtures(country, workers=BUILD_WORKERS, export_csv=True):
+    """
+    Combine the league fixtures of a country into the compact league_matches table, one row
+    per fixture. With `export_csv` the team-centric view is also written to league_fixtures.csv.
+
+    Returns:
+    - pd.DataFrame: Team-centric league fixtures.
+    """
     leagues = load_league_mappings(country)
-    all_fixtures = []
+    tasks = []
 
     for league, details in leagues.items():
         if 'fixtures' in details['data_types'] and details['division'] != 'NaN':
             for season in range(details['season_start'], details['season_end'] + 1):
-                fixtures_path = os.path.join(project_root(), 'data', 'raw', country, league, str(season),
-                                             'fixtures_data.json')
-                if os.path.isfile(fixtures_path):
-                    with open(fixtures_path, 'r') as file:
-                        fixtures_data = json.load(file)
-                        all_fixtures.extend(process_season_fixtures(fixtures_data, season))
-
-    df_fixtures = pd.DataFrame(all_fixtures)
-    df_fixtures['team_points_match'] = df_fixtures['team_win'].apply(
-        lambda x: 3 if x == 1 else (1 if pd.isna(x) else 0)
-    )
-
-    save_to_csv(df_fixtures, country, 'league_fixtures.csv')
+                tasks.append((country, league, season))
+
+    all_fixtures = [season_fixtures for season_fixtures in map_seasons(load_season_fixtures, tasks, workers)
+                    if season_fixtures is not None]
+
+    league_matches = compact_fixtures(pd.concat(all_fixtures, ignore_index=True), LEAGUE_FIXTURE_COLUMNS)
+    save_matches(league_matches, country, 'league')
+
+    df_fixtures = team_perspective(league_matches, LEAGUE_FIXTURE_COLUMNS)
+    if export_csv:
+        save_csv(df_fixtures, os.path.join(project_root(), 'data', 'process', country, 'league_fixtures.csv'))
     return df_fixtures
 
 
-def construct_league_data(country):
-    fixtures_final = compile_fixtures(country)
-    standings_final = compile_standings(country)
+def construct_league_data(country, workers=BUILD_WORKERS):
+    fixtures_final = compile_fixtures(country, workers)
+    standings_final = compile_standings(country, workers)
     print(fixtures_final.tail())
     print(standings_final.tail())
 
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.load import project_root
+
+# Source of a view column that holds the side of the team itself, 'home' or 'away'
+SIDE = '{team}'
+
+
+def winner_flag(winner):
+    """
+    Map the API `winner` field (True, False or None for a draw) to 1, 0 or NaN.
+    """
+    missing = winner.isna().to_numpy()
+    flag = (winner.to_numpy() == True).astype('int64')  # noqa: E712, the column holds Python booleans
+    if missing.any():
+        return pd.Series(np.where(missing, np.nan, flag), index=winner.index)
+    return pd.Series(flag, index=winner.index)
+
+
+def source_columns(columns):
+    """
+    Columns of the one-row-per-fixture frame that a team-perspective mapping refers to.
+    """
+    sources = []
+    for source in columns.values():
+        if source == SIDE:
+            continue
+        for team, opponent in (('home', 'away'), ('away', 'home')):
+            name = source.format(team=team, opponent=opponent)
+            if name not in sources:
+                sources.append(name)
+    return sources
+
+
+def compact_fixtures(fixtures, columns):
+    """
+    Canonical one-row-per-fixture frame of the columns that `columns` refers to: ids as int32 and
+    strings other than dates as categoricals, with one set of categories shared by the home and
+    away column of a pair.
+
+    Returns:
+    - pd.DataFrame: Compact fixtures.
+    """
+    compact = fixtures[source_columns(columns)].reset_index(drop=True).copy()
+    for source in columns.values():
+        if source == SIDE:
+            continue
+        pair = list(dict.fromkeys(source.format(team=team, opponent=opponent)
+                                  for team, opponent in (('home', 'away'), ('away', 'home'))))
+        if all(compact[name].dtype == object and 'date' not in name for name in pair):
+            categories = pd.Index(pd.unique(np.concatenate([compact[name].dropna().to_numpy() for name in pair])))
+            for name in pair:
+                compact[name] = pd.Categorical(compact[name], categories=categories)
+        elif all(name.endswith('id') and pd.api.types.is_integer_dtype(compact[name]) for name in pair):
+            for name in pair:
+                compact[name] = compact[name].astype('int32')
+    return compact
+
+
+def interleave(home, away):
+    """
+    Alternate the values of two columns, home first. Categoricals with the same categories
+    are interleaved on their codes, so the view shares the categories of the compact frame.
+    """
+    if isinstance(home.dtype, pd.CategoricalDtype) and home.dtype == away.dtype:
+        codes = interleave(pd.Series(home.cat.codes), pd.Series(away.cat.codes))
+        return pd.Categorical.from_codes(codes, dtype=home.dtype)
+    home, away = home.to_numpy(), away.to_numpy()
+    column = np.empty(2 * len(home), dtype=np.result_type(home, away))
+    column[0::2] = home
+    column[1::2] = away
+    return column
+
+
+def team_perspective(fixtures, columns):
+    """
+    Expand a flat fixtures frame into two team-centric rows per fixture, the home row first.
+
+    `columns` maps every output column to a column of `fixtures`; '{team}' and '{opponent}' in the
+    source name are filled with 'home' and 'away' for the home row and swapped for the away row,
+    e.g. {'team_name': '{team}_name', 'opponent_name': '{opponent}_name'}. The source SIDE gives
+    the side of the team itself.
+
+    Returns:
+    - pd.DataFrame: Team-centric rows in fixture order.
+    """
+    expanded = {}
+    for name, source in columns.items():
+        if source == SIDE:
+            expanded[name] = np.tile(np.array(['home', 'away'], dtype=object), len(fixtures))
+            continue
+        expanded[name] = interleave(fixtures[source.format(team='home', opponent='away')],
+                                    fixtures[source.format(team='away', opponent='home')])
+    return pd.DataFrame(expanded)
+
+
+def match_points(team_win):
+    """
+    League points of a team-centric result: 3 for a win, 1 for a draw (no winner) and 0 for a loss.
+    """
+    return np.select([team_win == 1, team_win.isna()], [3, 1], default=0)
+
+
+def matches_path(country, name):
+    return os.path.join(project_root(), 'data', 'process', country, f'{name}_matches.parquet')
+
+
+def save_matches(matches, country, name):
+    save_path = matches_path(country, name)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    matches.to_parquet(save_path, index=False)
+
+
+def load_matches(country, name, columns=None):
+    """
+    Read a compact fixtures table, with `columns` only the fixture columns a view needs.
+    """
+    return pd.read_parquet(matches_path(country, name), columns=columns)
@@ -0,0 +1,69 @@
+import pandas as pd
+from data.process.data_league import load_league_fixtures
+
+# Number of previous league matches that form is averaged over
+FORM_MATCHES = 5
+
+FORM_COLUMNS = ['form_ppg', 'form_goal_difference', 'form_win_rate']
+
+
+def league_form(league_fixtures, matches=FORM_MATCHES):
+    """
+    Form of every team after each of its played league fixtures: points per game, goal difference
+    per game and win rate over its last `matches` league fixtures, in one groupby-rolling pass over
+    the fixtures sorted by team and date.
+
+    Returns:
+    - pd.DataFrame: team_id, fixture_date and the form columns, sorted by fixture_date.
+    """
+    played = league_fixtures.dropna(subset=['team_goals', 'opponent_goals'])
+    form = pd.DataFrame({
+        'team_id': played['team_id'].to_numpy(dtype='int64'),
+        'fixture_date': pd.to_datetime(played['fixture_date'], utc=True).to_numpy(),
+        'form_ppg': played['team_points_match'].to_numpy(dtype='float64'),
+        'form_goal_difference': (played['team_goals'] - played['opponent_goals']).to_numpy(dtype='float64'),
+        'form_win_rate': (played['team_win'] == 1).to_numpy(dtype='float64'),
+    }).sort_values(by=['team_id', 'fixture_date'], kind='stable')
+
+    rolling = form.groupby('team_id')[FORM_COLUMNS].rolling(matches, min_periods=1).mean()
+    form[FORM_COLUMNS] = rolling.reset_index(level=0, drop=True)
+    form['fixture_date'] = pd.to_datetime(form['fixture_date'], utc=True)
+
+    return form.sort_values(by='fixture_date', kind='stable').reset_index(drop=True)
+
+
+def merge_with_form_data(cup_fixtures, form):
+    """
+    Merge cup fixtures with the league form of the team (`team_form_*`) and the opponent
+    (`opponent_form_*`) going into the fixture: the form after their last league fixture
+    before the cup fixture date, found with an as-of join.
+
+    Returns:
+    - pd.DataFrame: Merged dataframe with form data.
+    """
+    fixtures = pd.DataFrame({'row': range(len(cup_fixtures)),
+                             'fixture_date': pd.to_datetime(cup_fixtures['fixture_date'], utc=True).to_numpy(),
+                             'team_id': cup_fixtures['team_id'].to_numpy(dtype='int64'),
+                             'opponent_id': cup_fixtures['opponent_id'].to_numpy(dtype='int64')})
+    fixtures['fixture_date'] = pd.to_datetime(fixtures['fixture_date'], utc=True)
+    fixtures = fixtures.sort_values(by='fixture_date', kind='stable')
+
+    for side in ('team', 'opponent'):
+        side_form = form.rename(columns={'team_id': f'{side}_id', **{column: f'{side}_{column}'
+                                                                     for column in FORM_COLUMNS}})
+        fixtures = pd.merge_asof(fixtures, side_form, on='fixture_date', by=f'{side}_id',
+                                 allow_exact_matches=False)
+
+    fixtures = fixtures.sort_values(by='row')
+    for side in ('team', 'opponent'):
+        for column in FORM_COLUMNS:
+            cup_fixtures[f'{side}_{column}'] = fixtures[f'{side}_{column}'].to_numpy()
+
+    return cup_fixtures
+
+
+if __name__ == "__main__":
+    country = 'Germany'
+    league_fixtures = load_league_fixtures(country, columns=['fixture_date', 'team_id', 'team_win', 'team_goals',
+                                                             'opponent_goals', 'team_points_match'])
+    print(league_form(league_fixtures).tail())
@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.load import project_root, load_csv
+from data.process.data_league import TIEBREAKS, load_league_fixtures
+
+RECORD_COLUMNS = ['played', 'points', 'goals_diff', 'goals_for']
+
+SEASON_KEYS = ['league', 'year', 'fixture_date']
+
+# Rounds that count towards the league table; relegation play-offs bring in teams of other divisions
+TABLE_ROUND = 'Regular Season'
+
+
+def cumulative_records(league_fixtures):
+    """
+    Record of every team after each of its played regular season fixtures: matches played, points,
+    goal difference and goals scored so far in the league-season, summed in one sorted pass.
+
+    Returns:
+    - pd.DataFrame: league, year, fixture_date, team_id and the record columns, sorted by fixture_date.
+    """
+    played = league_fixtures.dropna(subset=['team_goals', 'opponent_goals'])
+    played = played[played['round'].astype(str).str.startswith(TABLE_ROUND)]
+    records = pd.DataFrame({
+        'league': played['league'].astype(str).to_numpy(),
+        'year': played['year'].to_numpy(dtype='int64'),
+        'fixture_date': pd.to_datetime(played['fixture_date'], utc=True).to_numpy(),
+        'team_id': played['team_id'].to_numpy(dtype='int64'),
+        'played': 1,
+        'points': played['team_points_match'].to_numpy(dtype='int64'),
+        'goals_diff': (played['team_goals'] - played['opponent_goals']).to_numpy(dtype='int64'),
+        'goals_for': played['team_goals'].to_numpy(dtype='int64'),
+    }).sort_values(by=['league', 'year', 'team_id', 'fixture_date'], kind='stable')
+
+    records[RECORD_COLUMNS] = records.groupby(['league', 'year', 'team_id'])[RECORD_COLUMNS].cumsum()
+    records['fixture_date'] = pd.to_datetime(records['fixture_date'], utc=True)
+    return records.sort_values(by='fixture_date', kind='stable').reset_index(drop=True)
+
+
+def standings_as_of(records, snapshots, tiebreak='goal_difference'):
+    """
+    Full league tables at the dates of `snapshots` (league, year and fixture_date columns):
+    every team of the league-season with its record from the fixtures before the date and
+    its position, ranked on points and the tiebreakers of `tiebreak`, then on team id.
+    There is no reported position during a season, so 'position' ranks on goal difference.
+
+    Returns:
+    - pd.DataFrame: One row per snapshot and team, with `live_position`.
+    """
+    keys = TIEBREAKS[tiebreak] or TIEBREAKS['goal_difference']
+    snapshots = pd.DataFrame({'league': snapshots['league'].astype(str).to_numpy(),
+                              'year': snapshots['year'].to_numpy(dtype='int64'),
+                              'fixture_date': pd.to_datetime(snapshots['fixture_date'], utc=True).to_numpy()})
+    snapshots['fixture_date'] = pd.to_datetime(snapshots['fixture_date'], utc=True)
+
+    teams = records[['league', 'year', 'team_id']].drop_duplicates()
+    table = (snapshots.drop_duplicates()
+             .merge(teams, on=['league', 'year'])
+             .sort_values(by='fixture_date', kind='stable'))
+    table = pd.merge_asof(table, records, on='fixture_date', by=['league', 'year', 'team_id'],
+                          allow_exact_matches=False)
+    table[RECORD_COLUMNS] = table[RECORD_COLUMNS].fillna(0).astype('int64')
+
+    table = table.sort_values(by=SEASON_KEYS + keys + ['team_id'],
+                              ascending=[True] * len(SEASON_KEYS) + [False] * len(keys) + [True])
+    table['live_position'] = table.groupby(SEASON_KEYS).cumcount() + 1
+    return table.reset_index(drop=True)
+
+
+def league_table(records, league, year, date, tiebreak='goal_difference'):
+    """
+    League table of one league-season as it stood at `date`.
+    """
+    snapshot = pd.DataFrame({'league': [league], 'year': [year], 'fixture_date': [date]})
+    return standings_as_of(records, snapshot, tiebreak).drop(columns=SEASON_KEYS)
+
+
+def live_positions(records, team_ids, years, dates, tiebreak='goal_difference'):
+    """
+    League, live position and points of teams at dates, for arrays of queries. A team is looked
+    up in the league it plays most of its matches in that season; the position is missing when
+    the team plays in no league that season or has not played a league match yet.
+
+    Returns:
+    - pd.DataFrame: league, live_position and live_points, one row per query in query order.
+    """
+    queries = pd.DataFrame({'row': np.arange(len(team_ids)),
+                            'team_id': np.asarray(team_ids, dtype='int64'),
+                            'year': np.asarray(years, dtype='int64'),
+                            'fixture_date': pd.to_datetime(pd.Series(dates), utc=True).to_numpy()})
+    queries['fixture_date'] = pd.to_datetime(queries['fixture_date'], utc=True)
+
+    season_leagues = (records.groupby(['year', 'team_id', 'league']).size().rename('matches').reset_index()
+                      .sort_values(by='matches', kind='stable')
+                      .drop_duplicates(subset=['year', 'team_id'], keep='last')
+                      .drop(columns=['matches']))
+    queries = queries.merge(season_leagues, on=['year', 'team_id'], how='left')
+
+    table = standings_as_of(records, queries.dropna(subset=['league']), tiebreak)
+    queries = queries.merge(table[SEASON_KEYS + ['team_id', 'played', 'points', 'live_position']],
+                            on=SEASON_KEYS + ['team_id'], how='left').sort_values(by='row')
+
+    started = queries['played'].to_numpy() > 0
+    return pd.DataFrame({'league': queries['league'].to_numpy(),
+                         'live_position': np.where(started, queries['live_position'], np.nan),
+                         'live_points': np.where(started, queries['points'], np.nan)})
+
+
+def check_table_sizes(records, league_standings):
+    """
+    League-seasons whose number of teams differs from the final standings of the league most
+    of their teams finished in, e.g. when play-off fixtures bring in a team of another division.
+
+    Returns:
+    - pd.DataFrame: league, year, teams and expected teams of every mismatch; empty when all match.
+    """
+    standings = league_standings[['year', 'team_id', 'league']].astype({'year': 'int64', 'team_id': 'int64',
+                                                                         'league': str})
+    expected = standings.groupby(['year', 'league']).size()
+
+    teams = (records[['league', 'year', 'team_id']].drop_duplicates()
+             .merge(standings.rename(columns={'league': 'standings_league'}), on=['year', 'team_id'], how='left'))
+    sizes = (teams.groupby(['league', 'year'])
+             .agg(teams=('team_id', 'size'),
+                  standings_league=('standings_league', lambda names: names.mode().iloc[0] if names.notna().any()
+                                    else None))
+             .reset_index())
+    sizes['expected'] = expected.reindex(pd.MultiIndex.from_arrays([sizes['year'], sizes['standings_league']]))\
+        .to_numpy()
+
+    mismatches = sizes[sizes['expected'].notna() & (sizes['teams'] != sizes['expected'])]
+    return mismatches[['league', 'year', 'teams', 'expected']].reset_index(drop=True)
+
+
+def merge_with_live_standings(cup_fixtures, records, tiebreak='goal_difference'):
+    """
+    Merge cup fixtures with the league position and points of the team (`team_live_*`) and
+    the opponent (`opponent_live_*`) on the day of the fixture, from one bulk lookup.
+
+    Returns:
+    - pd.DataFrame: Merged dataframe with live standings.
+    """
+    rows = len(cup_fixtures)
+    positions = live_positions(records,
+                               np.concatenate([cup_fixtures['team_id'], cup_fixtures['opponent_id']]),
+                               np.tile(cup_fixtures['year'].to_numpy(), 2),
+                               pd.concat([cup_fixtures['fixture_date']] * 2, ignore_index=True),
+                               tiebreak)
+
+    for side, part in (('team', positions.iloc[:rows]), ('opponent', positions.iloc[rows:])):
+        cup_fixtures[f'{side}_live_position'] = part['live_position'].to_numpy()
+        cup_fixtures[f'{side}_live_points'] = part['live_points'].to_numpy()
+
+    return cup_fixtures
+
+
+if __name__ == "__main__":
+    country = 'Germany'
+    league_fixtures = load_league_fixtures(country, columns=['league', 'year', 'round', 'fixture_date', 'team_id',
+                                                             'team_goals', 'opponent_goals', 'team_points_match'])
+    records = cumulative_records(league_fixtures)
+    print(check_table_sizes(records, load_csv(os.path.join(project_root(), 'data', 'process', country,
+                                                           'league_standings.csv'))))
+    print(league_table(records, records['league'].iloc[-1], records['year'].iloc[-1], records['fixture_date'].max()))
@@ -0,0 +1,21 @@
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of league-season files built at the same time by default
+BUILD_WORKERS = 1
+
+
+def map_seasons(function, tasks, workers=BUILD_WORKERS):
+    """
+    Call `function(*task)` for every task, spread over `workers` processes when more than one.
+    Every league-season file is independent, so they can be parsed on separate cores; the results
+    come back in the order of `tasks`, which keeps the concatenated tables deterministic.
+
+    Returns:
+    - list: The result of every task, in task order.
+    """
+    if not tasks:
+        return []
+    if workers is None or workers <= 1 or len(tasks) == 1:
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(function, *zip(*tasks), chunksize=max(1, len(tasks) // (4 * workers))))
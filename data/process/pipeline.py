@@ -0,0 +1,59 @@
+import queue
+import logging
+import threading
+from utils.load import load_league_mappings
+from data.raw.loader import request_raw_data, REDUCERS, MAX_WORKERS
+from data.process import data_cup, data_league
+
+
+def parse_response(country, league, season, kind, leagues):
+    """
+    Parse one stored response into its team-centric fragment, the same fragment the
+    cup and league builders read afterwards.
+    """
+    details = leagues[league]
+    if kind == 'standings':
+        data_league.load_season_standings(country, league, details['division'], season)
+    elif kind == 'fixtures' and details['division'] == 'NaN':
+        data_cup.load_season_fixtures(country, league, season, details['rounds'])
+    elif kind == 'fixtures':
+        data_league.load_season_fixtures(country, league, season)
+
+
+def request_and_parse(country, workers=MAX_WORKERS, **request_options):
+    """
+    Request the raw data of a country while a consumer thread parses every fixtures and standings
+    response into its fragment as soon as it is stored, so network waits and parsing overlap.
+    """
+    leagues = load_league_mappings(country)
+    responses = queue.Queue()
+    parsed = []
+
+    def consume():
+        while True:
+            item = responses.get()
+            if item is None:
+                return
+            try:
+                parse_response(country, *item, leagues)
+                parsed.append(item)
+            except Exception as e:
+                logging.error(f"Error parsing {item[2]} data for {item[0]} {item[1]}: {e}")
+
+    def produce(kind):
+        def reducer(country, league, season, data_dict):
+            responses.put((league, int(season), kind))
+        return reducer
+
+    reducers = dict(REDUCERS, fixtures=produce('fixtures'), standings=produce('standings'))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    try:
+        counts = request_raw_data(country, workers=workers, reducers=reducers, **request_options)
+    finally:
+        responses.put(None)
+        consumer.join()
+
+    logging.info(f"Parsed {len(parsed)} responses while requesting.")
+    return counts
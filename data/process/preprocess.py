@@ -1,9 +1,17 @@
 import os
+import numpy as np
 import pandas as pd
 
-from datetime import timedelta
-
 from utils.load import project_root, load_csv
+from utils.storage import save_table, table_exists
+from data.process.data_cup import load_cup_fixtures
+from data.process.data_league import load_league_fixtures
+from data.process.teams import build_team_registry, UNKNOWN
+from data.process.team_calendar import TeamCalendar, NO_FIXTURE
+from data.process.congestion import construct_congestion_data
+from data.process.form import league_form, merge_with_form_data
+from data.process.ratings import construct_rating_data
+from data.process.live_standings import cumulative_records, check_table_sizes, merge_with_live_standings
 
 
 def set_non_league_rank(team_data: pd.DataFrame, divisions: int = 4):
@@ -38,20 +46,6 @@ def set_non_league_rank(team_data: pd.DataFrame, divisions: int = 4):
     return team_data
 
 
-def find_next_cup_round(winning_team_id, current_round_date, cup_fixtures):
-    """
-    Find the next cup round date for the winning team based on their cup fixtures.
-    """
-    next_round_fixtures = cup_fixtures[
-        (cup_fixtures['team_id'] == winning_team_id) &
-        (cup_fixtures['fixture_date'] > current_round_date)
-        ].sort_values(by='fixture_date')
-
-    if not next_round_fixtures.empty:
-        return next_round_fixtures.iloc[0]['fixture_date']
-    return None
-
-
 def merge_cup_and_league_data(cup_fixtures: pd.DataFrame, league_standings: pd.DataFrame):
     """
     Merge cup fixtures with current year's national rank of the team (`team_rank`),
@@ -64,7 +58,9 @@ def merge_cup_and_league_data(cup_fixtures: pd.DataFrame, league_standings: pd.D
     Returns:
     - pd.DataFrame: Merged dataframe with cup and league data.
     """
-    league_standings = league_standings[league_standings['year'] > 2010].copy()
+    # Ranks are missing for teams outside the leagues after the left merges, so they are merged as floats
+    league_standings = (league_standings[league_standings['year'] > 2010]
+                        .astype({'division': 'float64', 'position': 'float64', 'national_rank': 'float64'}))
     league_standings['prev_year'] = league_standings['year'] + 1
     league_standings = league_standings.rename(columns={'position': 'league_rank'})
 
@@ -115,86 +111,98 @@ def merge_cup_and_league_data(cup_fixtures: pd.DataFrame, league_standings: pd.D
     return merged_data
 
 
-def merge_with_next_fixture_data(cup_fixtures, league_fixtures):
-    # Ensure that dates are in datetime format
-    cup_fixtures['fixture_date'] = pd.to_datetime(cup_fixtures['fixture_date'])
-    league_fixtures['fixture_date'] = pd.to_datetime(league_fixtures['fixture_date'])
-
-    result_rows = []
-
-    def find_next_cup_round(team_id, current_fixture_date, cup_fixtures):
-        next_cup_fixtures = cup_fixtures[
-            (cup_fixtures['team_id'] == team_id) &
-            (cup_fixtures['fixture_date'] > current_fixture_date)
-        ].sort_values(by='fixture_date')
-
-        if not next_cup_fixtures.empty:
-            return next_cup_fixtures.iloc[0]['fixture_date']
-        else:
-            return None
-
-    fixture_groups = cup_fixtures.groupby('fixture_id')
-
-    for fixture_id, fixture_data in fixture_groups:
-        fixture_date = fixture_data.iloc[0]['fixture_date']
-        teams_in_fixture = fixture_data['team_id'].unique()
-        winning_team_id = fixture_data[fixture_data['team_win'] == 1]['team_id'].values[0]
-
-        for team_id in teams_in_fixture:
-            next_matches_after_round_t = league_fixtures[
-                (league_fixtures['team_id'] == team_id) &
-                (league_fixtures['fixture_date'] > fixture_date)
-            ]
-
-            if not next_matches_after_round_t.empty:
-                next_match_after_t = next_matches_after_round_t.iloc[0]
-                next_fixture_date_after_t = next_match_after_t['fixture_date']
-                next_fixture_days_after_t = (next_fixture_date_after_t - fixture_date).days
-                next_team_points_after_t = next_match_after_t['team_points_match']
-            else:
-                next_fixture_date_after_t = None
-                next_fixture_days_after_t = None
-                next_team_points_after_t = None
-
-            next_fixture_date_after_t1 = None
-            next_fixture_days_after_t1 = None
-            next_team_points_after_t1 = None
-
-            if team_id == winning_team_id:
-                next_cup_round_date = find_next_cup_round(team_id, fixture_date, cup_fixtures)
-            else:
-                next_cup_round_date = find_next_cup_round(winning_team_id, fixture_date, cup_fixtures)
-                # Check if next_cup_round_date is not None before subtracting timedelta
-                if next_cup_round_date is not None:
-                    next_cup_round_date = next_cup_round_date - timedelta(days=0)
-                else:
-                    print(f"Next cup round date is None for team_id: {team_id} and fixture_date: {fixture_date}")
-
-            if next_cup_round_date is not None:
-                next_matches_after_round_t1 = league_fixtures[
-                    (league_fixtures['team_id'] == team_id) &
-                    (league_fixtures['fixture_date'] > next_cup_round_date)
-                ]
-
-                if not next_matches_after_round_t1.empty:
-                    next_match_after_t1 = next_matches_after_round_t1.iloc[0]
-                    next_fixture_date_after_t1 = next_match_after_t1['fixture_date']
-                    next_fixture_days_after_t1 = (next_fixture_date_after_t1 - next_cup_round_date).days
-                    next_team_points_after_t1 = next_match_after_t1['team_points_match']
-
-            result_rows.append({
-                'fixture_id': fixture_id,
-                'team_id': team_id,
-                'next_fixture_date_round': next_fixture_date_after_t,
-                'next_fixture_days_round': next_fixture_days_after_t,
-                'next_team_points_round': next_team_points_after_t,
-                'next_fixture_date_round_plus': next_fixture_date_after_t1,
-                'next_fixture_days_round_plus': next_fixture_days_after_t1,
-                'next_team_points_round_plus': next_team_points_after_t1
-            })
-
-    result_df = pd.DataFrame(result_rows)
-    merged_cup_fixtures = cup_fixtures.merge(result_df, on=['fixture_id', 'team_id'], how='left')
+def merge_with_next_fixture_data(cup_fixtures, league_fixtures, calendar=None, file_order=False):
+    """
+    Merge cup fixtures with the next league fixture of the team after the cup round
+    (`next_fixture_*_round`) and after the next cup round (`next_fixture_*_round_plus`):
+    its date, the days until it and the points the team took from it. The next cup round
+    is the next cup fixture of the winner of the fixture. The next league fixture is the
+    earliest later one by date; with `file_order` it is the first later one in the row order
+    of `league_fixtures`, which is how the committed processed data and results were made.
+
+    Lookups run on a TeamCalendar of the league and cup fixtures; pass `calendar` to reuse one.
+
+    Returns:
+    - pd.DataFrame: Merged dataframe with next fixture data.
+    """
+    cup_fixtures['fixture_date'] = pd.to_datetime(cup_fixtures['fixture_date'], utc=True)
+    league_fixtures['fixture_date'] = pd.to_datetime(league_fixtures['fixture_date'], utc=True)
+    if calendar is None:
+        calendar = TeamCalendar.from_frames({'league': league_fixtures, 'cup': cup_fixtures})
+    league_calendar, cup_calendar = calendar.select('league'), calendar.select('cup')
+
+    fixture_dates = cup_fixtures['fixture_date'].reset_index(drop=True)
+    team_ids = cup_fixtures['team_id'].to_numpy()
+    league_points = league_fixtures['team_points_match'].to_numpy()
+
+    next_fixture = league_calendar.first_after if file_order else league_calendar.next_after
+    next_round = next_fixture(team_ids, fixture_dates)
+    next_fixture_date_round = league_calendar.fixture_dates(next_round)
+
+    # The next cup round is the next cup fixture of the team that won the fixture
+    winners = cup_fixtures.loc[cup_fixtures['team_win'] == 1].drop_duplicates(subset=['fixture_id'])
+    winner_ids = (cup_fixtures['fixture_id'].map(winners.set_index('fixture_id')['team_id'])
+                  .fillna(UNKNOWN).to_numpy(dtype='int64'))
+    next_cup_round_date = cup_calendar.fixture_dates(cup_calendar.next_after(winner_ids, fixture_dates))
+    eliminated = next_cup_round_date.isna().to_numpy() & (winner_ids != team_ids)
+    for team_id, fixture_date in zip(team_ids[eliminated], fixture_dates[eliminated]):
+        print(f"Next cup round date is None for team_id: {team_id} and fixture_date: {fixture_date}")
+
+    next_round_plus = np.where(next_cup_round_date.notna().to_numpy(),
+                               next_fixture(team_ids, next_cup_round_date.fillna(fixture_dates)),
+                               NO_FIXTURE)
+    next_fixture_date_round_plus = league_calendar.fixture_dates(next_round_plus)
+
+    cup_fixtures['next_fixture_date_round'] = next_fixture_date_round.to_numpy()
+    cup_fixtures['next_fixture_days_round'] = (next_fixture_date_round - fixture_dates).dt.days.to_numpy()
+    cup_fixtures['next_team_points_round'] = league_calendar.take(next_round, league_points)
+    cup_fixtures['next_fixture_date_round_plus'] = next_fixture_date_round_plus.to_numpy()
+    cup_fixtures['next_fixture_days_round_plus'] = \
+        (next_fixture_date_round_plus - next_cup_round_date).dt.days.to_numpy()
+    cup_fixtures['next_team_points_round_plus'] = league_calendar.take(next_round_plus, league_points)
+
+    return cup_fixtures
+
+
+def merge_with_congestion_data(cup_fixtures, congestion):
+    """
+    Merge cup fixtures with the congestion features of the team around the cup fixture:
+    matches and minutes in the windows before and after it and the days of rest.
+
+    Returns:
+    - pd.DataFrame: Merged dataframe with congestion data.
+    """
+    cup_congestion = (congestion[congestion['competition'] != 'league']
+                      .drop(columns=['competition', 'year', 'opponent_id'])
+                      .drop_duplicates(subset=['fixture_date', 'team_id']))
+    cup_fixtures['fixture_date'] = pd.to_datetime(cup_fixtures['fixture_date'], utc=True)
+    cup_congestion['fixture_date'] = pd.to_datetime(cup_congestion['fixture_date'], utc=True)
+
+    return cup_fixtures.merge(cup_congestion, on=['fixture_date', 'team_id'], how='left')
+
+
+def merge_with_rating_data(cup_fixtures, ratings):
+    """
+    Merge cup fixtures with the pre-match Elo ratings of the team and the opponent
+    and their difference (`rating_diff`, opponent minus team).
+
+    Returns:
+    - pd.DataFrame: Merged dataframe with rating data.
+    """
+    cup_ratings = ratings[ratings['competition'] != 'league']
+    team_ratings = pd.concat([
+        cup_ratings[['fixture_date', 'home_id', 'home_rating']].set_axis(['fixture_date', 'team_id', 'rating'], axis=1),
+        cup_ratings[['fixture_date', 'away_id', 'away_rating']].set_axis(['fixture_date', 'team_id', 'rating'], axis=1),
+    ], ignore_index=True).drop_duplicates(subset=['fixture_date', 'team_id'])
+    team_ratings['fixture_date'] = pd.to_datetime(team_ratings['fixture_date'], utc=True)
+    cup_fixtures['fixture_date'] = pd.to_datetime(cup_fixtures['fixture_date'], utc=True)
+
+    merged_cup_fixtures = (cup_fixtures
+                           .merge(team_ratings.rename(columns={'rating': 'team_rating'}),
+                                  on=['fixture_date', 'team_id'], how='left')
+                           .merge(team_ratings.rename(columns={'team_id': 'opponent_id', 'rating': 'opponent_rating'}),
+                                  on=['fixture_date', 'opponent_id'], how='left')
+                           .assign(rating_diff=lambda df: df['opponent_rating'] - df['team_rating']))
 
     return merged_cup_fixtures
 
@@ -202,59 +210,82 @@ def merge_with_next_fixture_data(cup_fixtures, league_fixtures):
 def merge_with_distance_data(cup_fixtures, distance_data):
     """
     Merge cup fixtures dataframe with distance data, adding travel distance
-    information for away matches.
+    information for away matches. Pairs are matched on the team names of the fixture,
+    which the distance data was calculated from; registry keys are not used because
+    different teams can share a name.
 
     Returns:
     - pd.DataFrame: Merged dataframe with distance data.
     """
-    cup_fixtures['distance'] = 0
-    away_matches = cup_fixtures[cup_fixtures['team_home'] == 'away'].copy()
+    pairs = pd.DataFrame({'team_name': distance_data['team_name'].astype(object).to_numpy(),
+                          'opponent_name': distance_data['opponent_name'].astype(object).to_numpy(),
+                          'distance': distance_data['distance'].to_numpy()})
+    pairs = (pd.concat([pairs, pairs.rename(columns={'team_name': 'opponent_name', 'opponent_name': 'team_name'})],
+                       ignore_index=True)
+             .drop_duplicates(subset=['team_name', 'opponent_name'], keep='last'))
+
+    names = pd.DataFrame({'team_name': cup_fixtures['team_name'].astype(object).to_numpy(),
+                          'opponent_name': cup_fixtures['opponent_name'].astype(object).to_numpy()})
+    distances = names.merge(pairs, on=['team_name', 'opponent_name'], how='left')
+    away = (cup_fixtures['team_home'] == 'away').to_numpy()
+    cup_fixtures['distance'] = np.where(away, distances['distance'].to_numpy(dtype=float), 0)
 
-    distance_dict = {}
-    for index, row in distance_data.iterrows():
-        team1, team2, distance = row['team_name'], row['opponent_name'], row['distance']
-        distance_dict[(team1, team2)] = distance
-        distance_dict[(team2, team1)] = distance
+    return cup_fixtures
 
-    def lookup_distance(row):
-        team = row['team_name']
-        opponent = row['opponent_name']
-        return distance_dict.get((team, opponent), None)
 
-    away_matches['distance'] = away_matches.apply(lookup_distance, axis=1)
-    cup_fixtures.loc[away_matches.index, 'distance'] = away_matches['distance']
+def merge_with_injury_data(cup_fixtures, injuries_fixture, injuries_season):
+    """
+    Merge cup fixtures with the number of missing players of the team and the opponent
+    in the cup fixture and the team's injury totals of the season. Seasons covered by
+    the injury data get zeros where a team reported no injuries.
 
-    return cup_fixtures
+    Returns:
+    - pd.DataFrame: Merged dataframe with injury data.
+    """
+    fixture_injuries = injuries_fixture[['fixture_id', 'team_id', 'missing_players']]
 
+    merged_cup_fixtures = (cup_fixtures
+                           .merge(fixture_injuries.rename(columns={'missing_players': 'team_missing_players'}),
+                                  on=['fixture_id', 'team_id'], how='left')
+                           .merge(fixture_injuries.rename(columns={'team_id': 'opponent_id',
+                                                                   'missing_players': 'opponent_missing_players'}),
+                                  on=['fixture_id', 'opponent_id'], how='left')
+                           .merge(injuries_season[['year', 'team_id', 'missing_players_season']],
+                                  on=['year', 'team_id'], how='left'))
 
-def merge_with_financial_data(cup_fixtures, financial_data, team_mapping):
+    covered = merged_cup_fixtures['year'].isin(injuries_season['year'].unique())
+    injury_columns = ['team_missing_players', 'opponent_missing_players', 'missing_players_season']
+    merged_cup_fixtures.loc[covered, injury_columns] = merged_cup_fixtures.loc[covered, injury_columns].fillna(0)
+
+    return merged_cup_fixtures
+
+
+def merge_with_financial_data(cup_fixtures, financial_data, registry):
     """
-    Merge cup fixtures dataframe with financial data using a custom mapping
-    of team names. Custom mappings can be found in settings folder.
+    Merge cup fixtures dataframe with financial data. The Transfermarkt names of the
+    financial data are resolved to registry keys through the custom mapping of team
+    names in the settings folder, after which the merge runs on (year, team_key).
+    A team gets the city and financials of its latest mapped name in every season, also
+    in seasons where it played under a name that is missing from the mapping.
 
     Returns:
     - pd.DataFrame: Merged dataframe with financial data.
     """
-    cup_fixtures = cup_fixtures.merge(
-        team_mapping,
-        left_on='team_name',
-        right_on='cup_name',
-        how='left'
-    )
+    teams = registry.teams()
+    cup_fixtures['city'] = registry.attribute('city', cup_fixtures['team_key'])
 
-    cup_fixtures.drop(columns=['cup_name'], inplace=True)
+    financial_data = (financial_data
+                      .merge(teams[['team_key', 'transfermarkt_name']].dropna(),
+                             left_on='team_name', right_on='transfermarkt_name')
+                      .drop(columns=['team_name', 'transfermarkt_name']))
 
     merged_cup_fixtures = pd.merge(
         cup_fixtures,
         financial_data,
-        left_on=['year', 'financial_name'],
-        right_on=['year', 'team_name'],
-        how='left',
-        suffixes=('', '_fin')
+        on=['year', 'team_key'],
+        how='left'
     )
 
-    merged_cup_fixtures.drop(columns=['financial_name', 'team_name_fin'], inplace=True)
-
     return merged_cup_fixtures
 
 
@@ -262,30 +293,53 @@ def preprocess_data(country: str, cup: str):
     """
     Preprocess the data for a given country and cup by merging and enhancing data
     from various sources including cup fixtures, league standings, next fixtures,
-    distances, and financial information.
+    congestion, league form, ratings, live standings, distances, and financial information.
 
     Returns:
     - pd.DataFrame: Preprocessed dataframe with combined data from various sources.
     """
-    cup_fixtures = load_csv(os.path.join(project_root(), 'data', 'process', country, f'{cup}_fixtures.csv'))
-    league_standings = load_csv(os.path.join(project_root(), 'data', 'process', country, 'league_standings.csv'))
-    league_fixtures = load_csv(os.path.join(project_root(), 'data', 'process', country, 'league_fixtures.csv'))
-    distance_data = load_csv(os.path.join(project_root(), 'data', 'process', country, f'{cup}_distance_data.csv'))
+    cup_fixtures = load_cup_fixtures(country, cup)
+    league_standings = load_csv(os.path.join(project_root(), 'data', 'process', country, 'league_standings.csv'),
+                                columns=['year', 'league', 'division', 'position', 'team_id', 'national_rank'])
+    league_fixtures = load_league_fixtures(country, columns=['league', 'year', 'round', 'fixture_date', 'team_id',
+                                                             'team_win', 'team_goals', 'opponent_goals',
+                                                             'team_points_match'])
+    distance_data = load_csv(os.path.join(project_root(), 'data', 'process', country, f'{cup}_distance_data.csv'),
+                             columns=['team_name', 'opponent_name', 'distance'])
     financial_data = load_csv(os.path.join(project_root(), 'data', 'process', country, f'{cup}_financial_data.csv'))
-    team_mapping = load_csv(os.path.join(project_root(), 'settings', country, f'{cup}_team_mapping.csv'))
+
+    # Resolve every source identifier to the small integer keys of the team registry
+    registry = build_team_registry(country, cup)
+    cup_fixtures['team_key'] = registry.keys('api_id', cup_fixtures['team_id'])
+    cup_fixtures['opponent_key'] = registry.keys('api_id', cup_fixtures['opponent_id'])
 
     merged_cup_fixtures = merge_cup_and_league_data(cup_fixtures, league_standings)
     merged_cup_fixtures = merge_with_next_fixture_data(merged_cup_fixtures, league_fixtures)
+    merged_cup_fixtures = merge_with_congestion_data(merged_cup_fixtures, construct_congestion_data(country, cup))
+    merged_cup_fixtures = merge_with_form_data(merged_cup_fixtures, league_form(league_fixtures))
+    merged_cup_fixtures = merge_with_rating_data(merged_cup_fixtures, construct_rating_data(country, cup, registry))
+    league_records = cumulative_records(league_fixtures)
+    for mismatch in check_table_sizes(league_records, league_standings).itertuples():
+        print(f"League table of {mismatch.league} {mismatch.year} has {mismatch.teams} teams, "
+              f"expected {int(mismatch.expected)}")
+    merged_cup_fixtures = merge_with_live_standings(merged_cup_fixtures, league_records)
     merged_cup_fixtures = merge_with_distance_data(merged_cup_fixtures, distance_data)
-    merged_cup_fixtures = merge_with_financial_data(merged_cup_fixtures, financial_data, team_mapping)
+    merged_cup_fixtures = merge_with_financial_data(merged_cup_fixtures, financial_data, registry)
+
+    injuries_fixture_path = os.path.join(project_root(), 'data', 'process', country, 'injuries_fixture.csv')
+    injuries_season_path = os.path.join(project_root(), 'data', 'process', country, 'injuries_season.csv')
+    if table_exists(injuries_fixture_path) and table_exists(injuries_season_path):
+        merged_cup_fixtures = merge_with_injury_data(
+            merged_cup_fixtures,
+            load_csv(injuries_fixture_path, columns=['fixture_id', 'team_id', 'missing_players']),
+            load_csv(injuries_season_path, columns=['year', 'team_id', 'missing_players_season']))
 
     merged_cup_fixtures['team_home'] = merged_cup_fixtures['team_home'].apply(lambda x: 1 if x == 'home' else 0)
     merged_cup_fixtures['extra_time'] = merged_cup_fixtures['fixture_length'].apply(lambda x: 1 if x > 90 else 0)
 
-    # Save the final preprocessed data to a CSV file
+    # Save the final preprocessed data as Parquet, with a CSV export for the analysis scripts
     output_path = os.path.join(project_root(), 'data', 'process', country, f'{cup}_processed.csv')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    merged_cup_fixtures.to_csv(output_path, index=False)
+    save_table(merged_cup_fixtures, output_path, 'processed', export_csv=True)
 
     return merged_cup_fixtures
 
@@ -0,0 +1,194 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.load import project_root, load_csv
+from utils.storage import save_table, table_exists
+from data.process.fixtures import load_matches
+from data.process.teams import load_team_registry, UNKNOWN
+from data.process.team_calendar import date_values
+
+# Rating of a team before its first match
+INITIAL_RATING = 1500.0
+
+# Rating points exchanged in a match when the result is the opposite of what was expected
+K_FACTOR = 20.0
+
+# Rating points added to the home team when the expected result is calculated
+HOME_ADVANTAGE = 60.0
+
+MATCH_COLUMNS = ['year', 'fixture_date', 'home_id', 'away_id', 'home_win', 'away_win']
+
+
+def state_path(country, cup):
+    return os.path.join(project_root(), 'data', 'process', country, f'{cup}_ratings_state.parquet')
+
+
+def ratings_path(country, cup):
+    return os.path.join(project_root(), 'data', 'process', country, f'{cup}_ratings.csv')
+
+
+def expected_score(home_rating, away_rating):
+    """
+    Expected score of the home team, between 0 (sure loss) and 1 (sure win).
+    """
+    return 1 / (1 + 10 ** ((away_rating - home_rating - HOME_ADVANTAGE) / 400))
+
+
+class RatingEngine:
+    """
+    Elo ratings of the teams of a country. The state is a set of arrays indexed by the
+    registry key of a team: its rating, its number of rated matches and the date of its
+    last rated match, so applying a matchday is array arithmetic on the teams involved.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.ratings = np.full(len(registry), INITIAL_RATING)
+        self.matches = np.zeros(len(registry), dtype='int64')
+        self.last_match = np.full(len(registry), np.iinfo('int64').min)
+
+    @classmethod
+    def from_state(cls, registry, state):
+        """
+        Engine with the ratings of a saved state table. Teams are matched on their API id,
+        so the state stays valid when the registry gained teams since it was saved.
+        """
+        engine = cls(registry)
+        keys = registry.keys('api_id', state['api_id'])
+        known = keys != UNKNOWN
+        engine.ratings[keys[known]] = state['rating'].to_numpy()[known]
+        engine.matches[keys[known]] = state['matches'].to_numpy()[known]
+        engine.last_match[keys[known]] = state['last_match'].to_numpy(dtype='int64')[known]
+        return engine
+
+    def state(self):
+        """
+        State table with one row per team: team_key, api_id, rating, matches and last_match.
+        """
+        teams = self.registry.teams()
+        return pd.DataFrame({'team_key': teams['team_key'].to_numpy(),
+                             'api_id': teams['api_id'].to_numpy(),
+                             'rating': self.ratings[teams['team_key'].to_numpy()],
+                             'matches': self.matches[teams['team_key'].to_numpy()],
+                             'last_match': self.last_match[teams['team_key'].to_numpy()]})
+
+    @property
+    def updated(self):
+        """
+        Date (int64 nanoseconds) of the latest match the ratings include.
+        """
+        return self.last_match.max() if len(self.last_match) else np.iinfo('int64').min
+
+    def apply(self, home_keys, away_keys, scores, dates):
+        """
+        Rate matches in chronological order. Matches at the same time never share a team,
+        so each such batch is rated at once from the ratings before it.
+
+        Returns:
+        - tuple: Pre-match ratings of the home and the away teams.
+        """
+        order = np.argsort(dates, kind='stable')
+        home_keys, away_keys = np.asarray(home_keys)[order], np.asarray(away_keys)[order]
+        scores, dates = np.asarray(scores, dtype='float64')[order], np.asarray(dates, dtype='int64')[order]
+
+        home_ratings, away_ratings = np.empty(len(order)), np.empty(len(order))
+        starts = np.flatnonzero(np.diff(dates, prepend=dates[:1] - 1))
+        for start, end in zip(starts, np.append(starts[1:], len(order))):
+            home, away = home_keys[start:end], away_keys[start:end]
+            home_ratings[start:end], away_ratings[start:end] = self.ratings[home], self.ratings[away]
+            change = K_FACTOR * (scores[start:end] - expected_score(self.ratings[home], self.ratings[away]))
+            np.add.at(self.ratings, home, change)
+            np.add.at(self.ratings, away, -change)
+            np.add.at(self.matches, home, 1)
+            np.add.at(self.matches, away, 1)
+            self.last_match[home] = dates[start]
+            self.last_match[away] = dates[start]
+
+        pre_match = np.empty(len(order)), np.empty(len(order))
+        pre_match[0][order], pre_match[1][order] = home_ratings, away_ratings
+        return pre_match
+
+
+def rating_fixtures(country, cup):
+    """
+    Played league and cup fixtures of a country, one row per fixture, with the score of the
+    home team: 1 for a win, 0 for a loss and 0.5 for a draw.
+
+    Returns:
+    - pd.DataFrame: Fixtures sorted by date.
+    """
+    fixtures = []
+    for name in ('league', cup):
+        columns = MATCH_COLUMNS + (['home_goals'] if name == 'league' else [])
+        matches = load_matches(country, name, columns=columns)
+        # League fixtures are played once they have a score, cup fixtures once they have a winner
+        played = matches['home_goals'].notna() if name == 'league' else matches['home_win'].notna()
+        fixtures.append(matches.loc[played, MATCH_COLUMNS].assign(competition=name))
+    fixtures = pd.concat(fixtures, ignore_index=True)
+
+    fixtures['fixture_date'] = pd.to_datetime(fixtures['fixture_date'], utc=True)
+    fixtures['home_score'] = np.select([fixtures['home_win'] == 1, fixtures['away_win'] == 1], [1.0, 0.0], 0.5)
+    return (fixtures.drop(columns=['home_win', 'away_win'])
+            .sort_values(by='fixture_date', kind='stable')
+            .reset_index(drop=True))
+
+
+def late_fixtures(fixtures, history):
+    """
+    Number of fixtures that are not in the saved ratings, e.g. a backfilled season or cup round.
+    """
+    keys = ['competition', 'fixture_date', 'home_id', 'away_id']
+    rated = history[keys].astype({'competition': str, 'home_id': 'int64', 'away_id': 'int64'})
+    rated['fixture_date'] = pd.to_datetime(rated['fixture_date'], utc=True)
+    known = (fixtures[keys].astype({'competition': str, 'home_id': 'int64', 'away_id': 'int64'})
+             .merge(rated.drop_duplicates(), on=keys, how='left', indicator=True))
+    return int((known['_merge'] == 'left_only').sum())
+
+
+def construct_rating_data(country, cup, registry=None, incremental=True):
+    """
+    Pre-match Elo ratings of both teams of every league and cup fixture of a country, saved as
+    {cup}_ratings in data/process together with the rating state after the latest fixture.
+    With `incremental` and a saved state, only fixtures after the latest rated one are rated
+    and appended, so a new matchday or season does not replay the history. When fixtures
+    dated before the latest rated one were added, all fixtures are rated again.
+
+    Returns:
+    - pd.DataFrame: Fixtures with `home_rating` and `away_rating`.
+    """
+    registry = registry if registry is not None else load_team_registry(country)
+    fixtures = rating_fixtures(country, cup)
+
+    engine, history = RatingEngine(registry), None
+    if incremental and os.path.isfile(state_path(country, cup)) and table_exists(ratings_path(country, cup)):
+        engine = RatingEngine.from_state(registry, pd.read_parquet(state_path(country, cup)))
+        history = load_csv(ratings_path(country, cup))
+        later = date_values(fixtures['fixture_date']) > engine.updated
+        if late_fixtures(fixtures[~later], history):
+            # Fixtures that arrived after later ones were rated change every rating since, so replay all
+            print(f"Fixtures dated before the saved ratings of {country} were added, replaying all fixtures")
+            engine, history = RatingEngine(registry), None
+        else:
+            fixtures = fixtures[later].reset_index(drop=True)
+
+    home_keys = registry.keys('api_id', fixtures['home_id'])
+    away_keys = registry.keys('api_id', fixtures['away_id'])
+    known = (home_keys != UNKNOWN) & (away_keys != UNKNOWN)
+    fixtures, home_keys, away_keys = fixtures[known].reset_index(drop=True), home_keys[known], away_keys[known]
+
+    dates = date_values(fixtures['fixture_date'])
+    fixtures['home_rating'], fixtures['away_rating'] = engine.apply(home_keys, away_keys,
+                                                                    fixtures['home_score'].to_numpy(), dates)
+    if history is not None:
+        fixtures = pd.concat([history, fixtures], ignore_index=True)
+
+    engine.state().to_parquet(state_path(country, cup), index=False)
+    return save_table(fixtures, ratings_path(country, cup), 'ratings')
+
+
+if __name__ == "__main__":
+    country = 'Germany'
+    cup = 'DFB_Pokal'
+    rating_data = construct_rating_data(country, cup, incremental=False)
+
+    print(rating_data.tail())
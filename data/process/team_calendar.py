@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+# Position returned when a team has no fixture that matches a query
+NO_FIXTURE = -1
+
+
+def date_values(dates):
+    """
+    Dates as int64 nanoseconds since the epoch in UTC; strings, naive and aware dates are accepted.
+    """
+    dates = pd.to_datetime(pd.Series(dates), utc=True)
+    return dates.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+class TeamCalendar:
+    """
+    Fixture dates of every team across competitions, sorted per team so that "next fixture after",
+    "previous fixture before" and "fixtures in a window" are binary searches instead of scans.
+
+    Entries are kept in one array ordered by (team, date); the entry at position i is fixture
+    `rows[i]` of competition `competitions[i]` in the frames the calendar was built from.
+    Queries take arrays of team ids and dates and return entry positions, NO_FIXTURE where
+    there is none.
+    """
+
+    def __init__(self, team_ids, dates, competitions, rows, names):
+        order = np.lexsort((dates, team_ids))
+        self.team_ids = np.asarray(team_ids, dtype='int64')[order]
+        self.dates = np.asarray(dates, dtype='int64')[order]
+        self.competitions = np.asarray(competitions, dtype='int8')[order]
+        self.rows = np.asarray(rows, dtype='int64')[order]
+        self.names = list(names)
+        self.teams, self.team_index = np.unique(self.team_ids, return_inverse=True)
+        self.origin = self.dates.min() if len(self.dates) else 0
+        self.keys = self.key(self.team_index, self.dates)
+        self.selections = {}
+        self.source_first = None
+
+    @classmethod
+    def from_frames(cls, frames, team_column='team_id', date_column='fixture_date'):
+        """
+        Build a calendar from team-centric fixture frames, e.g. {'league': league_fixtures, 'cup': cup_fixtures}.
+        """
+        team_ids, dates, competitions, rows = [], [], [], []
+        for code, frame in enumerate(frames.values()):
+            team_ids.append(frame[team_column].to_numpy(dtype='int64'))
+            dates.append(date_values(frame[date_column]))
+            competitions.append(np.full(len(frame), code, dtype='int8'))
+            rows.append(np.arange(len(frame)))
+        return cls(np.concatenate(team_ids), np.concatenate(dates), np.concatenate(competitions),
+                   np.concatenate(rows), frames.keys())
+
+    def __len__(self):
+        return len(self.dates)
+
+    def key(self, team_index, dates):
+        # Team in the high bits and seconds since the first fixture in the low bits, so one
+        # sorted int64 array answers per team date searches for all teams at once. Dates before
+        # the first fixture map to 0, below every fixture of the team.
+        seconds = (np.asarray(dates, dtype='int64') - self.origin) // 10 ** 9
+        return (np.asarray(team_index, dtype='int64') << 33) + np.clip(seconds, -1, 2 ** 33 - 2) + 1
+
+    def select(self, *competitions):
+        """
+        Calendar of only the given competitions, built once and cached.
+        """
+        if competitions not in self.selections:
+            codes = [self.names.index(name) for name in competitions]
+            keep = np.isin(self.competitions, codes)
+            self.selections[competitions] = TeamCalendar(self.team_ids[keep], self.dates[keep],
+                                                         self.competitions[keep], self.rows[keep], self.names)
+        return self.selections[competitions]
+
+    def bounds(self, team_ids, dates, side):
+        """
+        Position of `dates` among the fixtures of each team, and the first and end position of the team.
+        """
+        team_ids = np.asarray(team_ids, dtype='int64')
+        team_index = np.searchsorted(self.teams, team_ids)
+        known = (team_index < len(self.teams)) & (self.teams[np.minimum(team_index, len(self.teams) - 1)] == team_ids)
+        team_index = np.where(known, team_index, 0)
+        first = np.searchsorted(self.keys, team_index << 33, side='left')
+        end = np.where(known, np.searchsorted(self.keys, (team_index + 1) << 33, side='left'), first)
+        position = np.searchsorted(self.keys, self.key(team_index, dates), side=side)
+        return np.clip(position, first, end), first, end
+
+    def next_after(self, team_ids, dates, inclusive=False):
+        """
+        Entry of the first fixture of each team after (or with `inclusive`, on or after) the date.
+
+        Returns:
+        - np.ndarray: Entry positions, NO_FIXTURE where the team plays no later fixture.
+        """
+        position, _, end = self.bounds(team_ids, date_values(dates), 'left' if inclusive else 'right')
+        return np.where(position < end, position, NO_FIXTURE)
+
+    def first_after(self, team_ids, dates):
+        """
+        Entry of the fixture of each team after the date that comes first in the source frames,
+        rather than first by date; this is what filtering the frames and taking the first row gives.
+
+        Returns:
+        - np.ndarray: Entry positions, NO_FIXTURE where the team plays no later fixture.
+        """
+        if self.source_first is None:
+            # Per entry, the entry at or after it of the same team that comes first in the source frames
+            source_rank = np.empty(len(self), dtype='int64')
+            source_rank[np.lexsort((self.rows, self.competitions))] = np.arange(len(self))
+            first_rank = pd.Series(source_rank[::-1]).groupby(self.team_index[::-1]).cummin().to_numpy()[::-1]
+            positions = np.empty(len(self), dtype='int64')
+            positions[source_rank] = np.arange(len(self))
+            self.source_first = positions[first_rank]
+        position = self.next_after(team_ids, dates)
+        return np.where(position != NO_FIXTURE, self.source_first[position], NO_FIXTURE)
+
+    def prev_before(self, team_ids, dates, inclusive=False):
+        """
+        Entry of the last fixture of each team before (or with `inclusive`, on or before) the date.
+
+        Returns:
+        - np.ndarray: Entry positions, NO_FIXTURE where the team played no earlier fixture.
+        """
+        position, first, _ = self.bounds(team_ids, date_values(dates), 'right' if inclusive else 'left')
+        return np.where(position > first, position - 1, NO_FIXTURE)
+
+    def in_window(self, team_ids, starts, ends):
+        """
+        Fixtures of each team from `starts` up to but excluding `ends`.
+
+        Returns:
+        - tuple: First entry position and end position per query; the count is their difference.
+        """
+        first, _, _ = self.bounds(team_ids, date_values(starts), 'left')
+        end, _, _ = self.bounds(team_ids, date_values(ends), 'left')
+        return first, np.maximum(end, first)
+
+    def take(self, positions, values):
+        """
+        Values of the fixtures at entry positions, from an array aligned with the rows of the source
+        frame; missing (NaN) where a position is NO_FIXTURE.
+        """
+        positions = np.asarray(positions)
+        found = positions != NO_FIXTURE
+        taken = np.full(len(positions), np.nan, dtype='float64' if np.asarray(values).dtype.kind in 'biuf'
+                        else 'object')
+        taken[found] = np.asarray(values)[self.rows[positions[found]]]
+        return taken
+
+    def fixture_dates(self, positions):
+        """
+        Dates of the fixtures at entry positions as UTC timestamps, NaT where a position is NO_FIXTURE.
+        """
+        positions = np.asarray(positions)
+        found = positions != NO_FIXTURE
+        dates = self.dates[np.where(found, positions, 0)].astype('datetime64[ns]')
+        dates[~found] = np.datetime64('NaT')
+        return pd.Series(dates).dt.tz_localize('UTC')
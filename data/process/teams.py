@@ -0,0 +1,126 @@
+import os
+import functools
+import numpy as np
+import pandas as pd
+from utils.load import project_root, load_csv
+from data.process.fixtures import matches_path, load_matches
+
+# Key of identifiers that are not in the registry
+UNKNOWN = -1
+
+
+def registry_path(country):
+    return os.path.join(project_root(), 'data', 'process', country, 'team_registry.parquet')
+
+
+class TeamRegistry:
+    """
+    Dense integer keys for the teams of a country. Every row of `table` is one known name of a team:
+    team_key, api_id and api_name from API-Football, transfermarkt_name and city from the team mapping
+    in the settings folder. A team is identified by its API id, so the names it played under over
+    the years share one key; the Transfermarkt name and city of a key are the ones of its latest name.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.lookups = {}
+
+    def __len__(self):
+        return int(self.table['team_key'].max()) + 1 if len(self.table) else 0
+
+    def lookup(self, source):
+        """
+        Cached index of the identifiers of one source ('api_id', 'api_name', 'transfermarkt_name' or 'city')
+        and the key at every position.
+        """
+        if source not in self.lookups:
+            known = self.table.dropna(subset=[source]).drop_duplicates(subset=[source], keep='last')
+            self.lookups[source] = (pd.Index(known[source]), known['team_key'].to_numpy())
+        return self.lookups[source]
+
+    def keys(self, source, values):
+        """
+        Keys of an array of identifiers of one source, UNKNOWN where an identifier is not registered.
+
+        Returns:
+        - np.ndarray: int32 keys.
+        """
+        index, keys = self.lookup(source)
+        positions = index.get_indexer(pd.Index(values))
+        return np.where(positions >= 0, keys[positions], UNKNOWN).astype('int32')
+
+    def teams(self):
+        """
+        One row per key with the API id, Transfermarkt name and city of the team.
+        """
+        return (self.table.drop_duplicates(subset=['team_key'], keep='last')
+                .drop(columns=['api_name'])
+                .sort_values(by='team_key')
+                .reset_index(drop=True))
+
+    def attribute(self, column, keys):
+        """
+        Value of a team column (e.g. 'city') for an array of keys, NaN for UNKNOWN keys.
+        """
+        teams = self.teams().set_index('team_key')[column]
+        return teams.reindex(keys).to_numpy()
+
+
+def build_team_registry(country, cup):
+    """
+    Register every team of the stored cup and league fixtures of a country and attach the
+    Transfermarkt name and city of the team mapping, then save the registry table.
+
+    Returns:
+    - TeamRegistry: The registry of the country.
+    """
+    aliases = []
+    for name in (cup, 'league'):
+        if not os.path.isfile(matches_path(country, name)):
+            continue
+        matches = load_matches(country, name, columns=['year', 'home_id', 'home_name', 'away_id', 'away_name'])
+        for side in ('home', 'away'):
+            aliases.append(pd.DataFrame({'year': matches['year'].to_numpy(),
+                                         'api_id': matches[f'{side}_id'].to_numpy(),
+                                         'api_name': matches[f'{side}_name'].astype(object).to_numpy()}))
+
+    # Latest season last, so the latest name of a team is the one kept per key
+    aliases = (pd.concat(aliases, ignore_index=True)
+               .sort_values(by=['api_id', 'year'], kind='stable')
+               .drop_duplicates(subset=['api_id', 'api_name'], keep='last')
+               .drop(columns=['year']))
+    aliases['team_key'] = pd.factorize(aliases['api_id'], sort=True)[0].astype('int32')
+
+    mapping_path = os.path.join(project_root(), 'settings', country, f'{cup}_team_mapping.csv')
+    if os.path.isfile(mapping_path):
+        mapping = (load_csv(mapping_path)
+                   .rename(columns={'cup_name': 'api_name', 'financial_name': 'transfermarkt_name'})
+                   .drop_duplicates(subset=['api_name'], keep='last'))
+        aliases = aliases.merge(mapping[['api_name', 'transfermarkt_name', 'city']], on='api_name', how='left')
+    else:
+        aliases['transfermarkt_name'] = None
+        aliases['city'] = None
+
+    # One Transfermarkt name and city per team: the latest mapped one
+    for column in ('transfermarkt_name', 'city'):
+        aliases[column] = aliases.groupby('team_key')[column].transform('last')
+
+    table = aliases[['team_key', 'api_id', 'api_name', 'transfermarkt_name', 'city']].reset_index(drop=True)
+    save_path = registry_path(country)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    table.to_parquet(save_path, index=False)
+    load_team_registry.cache_clear()
+    return TeamRegistry(table)
+
+
+@functools.lru_cache(maxsize=None)
+def load_team_registry(country):
+    """
+    The saved registry of a country, read once per process.
+    """
+    return TeamRegistry(pd.read_parquet(registry_path(country)))
+
+
+if __name__ == "__main__":
+    registry = build_team_registry('Germany', 'DFB_Pokal')
+    print(registry.teams())
@@ -0,0 +1,80 @@
+import os
+import time
+import json
+import tempfile
+import threading
+import logging
+import numpy as np
+from data.raw.client import ApiClient
+from data.raw.limiter import TokenBucket
+from data.raw.loader import request_raw_data
+from data.raw.manifest import Manifest
+from data.raw.store import RAW_ROOT_ENV
+from data.raw.stub_server import start_server
+
+
+class TimedClient(ApiClient):
+    """
+    ApiClient that records the latency of every request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self.latencies_lock = threading.Lock()
+
+    def request(self, endpoint, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super().request(endpoint, timeout)
+        finally:
+            with self.latencies_lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def run_benchmark(country='Germany', workers=4, latency=0.05, rate_429=0.0, error_rate=0.0,
+                  per_minute=10 ** 6, per_day=10 ** 6):
+    """
+    Run the raw data ingestion for `country` against the local stand-in server with synthetic payloads,
+    writing into a temporary raw store.
+
+    Returns:
+    - dict: Requests, requests/s, p50/p99 latency in ms and received bytes/s.
+    """
+    server = start_server(source='synthetic', latency=latency, rate_429=rate_429, error_rate=error_rate)
+    client = TimedClient('benchmark', host=f'127.0.0.1:{server.server_address[1]}', pool_size=workers,
+                         secure=False)
+    previous_root = os.environ.get(RAW_ROOT_ENV)
+
+    try:
+        with tempfile.TemporaryDirectory() as raw_root:
+            os.environ[RAW_ROOT_ENV] = raw_root
+            start = time.perf_counter()
+            request_raw_data(country, workers=workers, limiter=TokenBucket(per_minute, per_day), client=client,
+                             manifest=Manifest(os.path.join(raw_root, 'manifest.json')), reducers={})
+            elapsed = time.perf_counter() - start
+    finally:
+        if previous_root is None:
+            os.environ.pop(RAW_ROOT_ENV, None)
+        else:
+            os.environ[RAW_ROOT_ENV] = previous_root
+        server.shutdown()
+        client.close()
+
+    latencies = np.array(client.latencies) * 1000
+    return {
+        'country': country,
+        'workers': workers,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+        'bytes_per_second': round(client.bytes_received / elapsed),
+    }
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    for workers in (1, 4, 8):
+        print(json.dumps(run_benchmark(workers=workers)))
@@ -0,0 +1,114 @@
+import gzip
+import http.client
+import json
+import queue
+import ssl
+import threading
+import certifi
+
+API_HOST = "v3.football.api-sports.io"
+POOL_SIZE = 4
+TIMEOUT = 30
+
+
+class ApiClient:
+    """
+    Keep-alive HTTPS client for API-Football.
+
+    One SSL context is loaded for the lifetime of the client and up to `pool_size`
+    connections are kept open and handed out to worker threads. With `secure=False`
+    plain HTTP is used, e.g. against the local stand-in server.
+    """
+
+    def __init__(self, api_key, host=API_HOST, pool_size=POOL_SIZE, timeout=TIMEOUT, secure=True):
+        self.api_key = api_key
+        self.host = host
+        self.timeout = timeout
+        self.secure = secure
+        self.context = ssl.create_default_context(cafile=certifi.where()) if secure else None
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.bytes_received = 0
+        self.bytes_lock = threading.Lock()
+
+    def _connect(self, timeout):
+        if not self.secure:
+            return http.client.HTTPConnection(self.host, timeout=timeout)
+        return http.client.HTTPSConnection(self.host, context=self.context, timeout=timeout)
+
+    def _checkout(self, timeout):
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            return self._connect(timeout)
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.timeout = timeout
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def get(self, endpoint, timeout=None):
+        """
+        Send a GET request and decode the JSON body.
+
+        Returns:
+        - tuple: HTTP status and the decoded response dict.
+        """
+        status, data_dict, _ = self.request(endpoint, timeout)
+        return status, data_dict
+
+    def request(self, endpoint, timeout=None):
+        """
+        Like `get`, but also report the size of the response on the wire.
+
+        Returns:
+        - tuple: HTTP status, the decoded response dict and the number of bytes received.
+        """
+        timeout = timeout or self.timeout
+        headers = {
+            'x-rapidapi-host': self.host,
+            'x-rapidapi-key': self.api_key,
+            'Accept-Encoding': 'gzip',
+        }
+
+        # A pooled connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            conn = self._checkout(timeout) if attempt == 0 else self._connect(timeout)
+            try:
+                conn.request("GET", endpoint, headers=headers)
+                res = conn.getresponse()
+                data = res.read()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError,
+                    ConnectionResetError):
+                conn.close()
+                if attempt == 1:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+            break
+
+        if res.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+
+        nbytes = len(data)
+        with self.bytes_lock:
+            self.bytes_received += nbytes
+
+        if res.getheader('Content-Encoding', '') == 'gzip':
+            data = gzip.decompress(data)
+        return res.status, json.loads(data.decode("utf-8")), nbytes
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
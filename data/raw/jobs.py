@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import random
+import threading
+from data.raw.store import raw_root
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+
+
+def jobs_path(name='jobs'):
+    return os.path.join(raw_root(), f'{name}.json')
+
+
+def backoff_delay(attempts):
+    """
+    Exponential backoff with equal jitter: half of the delay is fixed, the other half random.
+    """
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobQueue:
+    """
+    Persistent queue of (country, league, season, kind) requests.
+
+    Jobs move from `pending` to `running` to `done`; failed jobs go back to `pending` with a
+    backoff delay until they have used MAX_ATTEMPTS attempts, after which they are `dead`.
+    Every finished attempt is written to disk, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or jobs_path()
+        self.jobs = {}
+        self.stopped = False
+        self.condition = threading.Condition()
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as file:
+                self.jobs = json.load(file)
+        # Jobs that were running when a previous run was interrupted start over
+        for job in self.jobs.values():
+            if job['state'] == 'running':
+                job['state'] = 'pending'
+
+    @staticmethod
+    def key(country, league, season, kind):
+        return f'{country}/{league}/{season}/{kind}'
+
+    def add(self, country, league, league_id, season, kind, retry_dead=False, priority=0, params=None):
+        """
+        Queue a request. Finished jobs are queued again so the manifest can decide whether they are stale,
+        dead jobs only when `retry_dead` is set. Due jobs are claimed lowest `priority` first.
+        `params` holds request specific settings, e.g. the fixture ids of a batch.
+        """
+        with self.condition:
+            key = self.key(country, league, season, kind)
+            job = self.jobs.get(key)
+            if job is None:
+                self.jobs[key] = {'country': country, 'league': league, 'league_id': str(league_id),
+                                  'season': str(season), 'kind': kind, 'state': 'pending', 'attempts': 0,
+                                  'next_attempt_at': 0, 'last_error': None, 'priority': priority,
+                                  'params': params}
+            else:
+                job['priority'] = priority
+                if job['state'] == 'done' or (job['state'] == 'dead' and retry_dead):
+                    job.update(state='pending', attempts=0, next_attempt_at=0)
+            self.condition.notify_all()
+
+    def claim(self):
+        """
+        Block until a pending job is due and mark it running.
+
+        Returns:
+        - dict or None: The claimed job, None when the queue is drained or stopped.
+        """
+        with self.condition:
+            while not self.stopped:
+                now = time.time()
+                pending = [job for job in self.jobs.values() if job['state'] == 'pending']
+                due = [job for job in pending if job['next_attempt_at'] <= now]
+                if due:
+                    job = min(due, key=lambda job: job.get('priority', 0))
+                    job['state'] = 'running'
+                    return job
+                if pending:
+                    self.condition.wait(min(job['next_attempt_at'] for job in pending) - now)
+                elif any(job['state'] == 'running' for job in self.jobs.values()):
+                    # A running job may still fail and come back as pending
+                    self.condition.wait()
+                else:
+                    return None
+            return None
+
+    def complete(self, job):
+        with self.condition:
+            job.update(state='done', last_error=None)
+            self._save()
+            self.condition.notify_all()
+
+    def fail(self, job, error):
+        with self.condition:
+            job['attempts'] += 1
+            job['last_error'] = error
+            if job['attempts'] >= MAX_ATTEMPTS:
+                job['state'] = 'dead'
+            else:
+                job['state'] = 'pending'
+                job['next_attempt_at'] = time.time() + backoff_delay(job['attempts'])
+            self._save()
+            self.condition.notify_all()
+            return job['state']
+
+    def release(self, job):
+        """
+        Put a claimed job back without counting an attempt, e.g. when the daily budget ran out.
+        """
+        with self.condition:
+            job['state'] = 'pending'
+            self._save()
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def dead_letters(self):
+        with self.condition:
+            return [job for job in self.jobs.values() if job['state'] == 'dead']
+
+    def counts(self):
+        with self.condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+            return counts
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.jobs, file, indent=1)
+        os.replace(tmp_path, self.path)
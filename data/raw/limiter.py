@@ -0,0 +1,53 @@
+import threading
+import time
+import logging
+
+# API-Football free plan limits
+REQUESTS_PER_MINUTE = 10
+REQUESTS_PER_DAY = 100
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker of an ingestion run.
+
+    The minute bucket refills continuously at `per_minute / 60` tokens per second,
+    the daily budget is a hard cap that does not refill within the lifetime of the bucket.
+    """
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, per_day=REQUESTS_PER_DAY):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.tokens = float(per_minute)
+        self.used_today = 0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self.last_refill) * self.per_minute / 60)
+        self.last_refill = now
+
+    def remaining_today(self):
+        with self.lock:
+            return self.per_day - self.used_today
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Returns:
+        - bool: False if the daily budget is exhausted, True otherwise.
+        """
+        while True:
+            with self.lock:
+                if self.used_today >= self.per_day:
+                    return False
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.used_today += 1
+                    return True
+                wait = (1 - self.tokens) * 60 / self.per_minute
+            logging.info(f"Rate limit approached, sleeping for {round(wait, 2)} seconds")
+            time.sleep(wait)
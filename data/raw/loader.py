@@ -1,91 +1,172 @@
 import os
-import http.client
-import json
 import time
 import logging
-import ssl
-import certifi
+from concurrent.futures import ThreadPoolExecutor
 from utils.load import load_mappings_from_yaml, load_api_key, project_root
+from data.raw.client import ApiClient
+from data.raw.limiter import TokenBucket
+from data.raw.jobs import JobQueue, jobs_path
+from data.raw.manifest import Manifest
+from data.injury.loader import store_injury_fragment
+from data.raw.store import raw_exists, read_raw, write_raw
+from data.raw.telemetry import Telemetry
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Number of requests kept in flight at the same time
+MAX_WORKERS = 4
 
-def request_data(country, league_name, league_id, season, data_type, request_counter, start_time, api_key):
-    directory_path = os.path.join(project_root(), 'data', 'raw', country, league_name, season)
+# Number of extra pages of one paginated response requested at the same time
+PAGE_WORKERS = 4
+
+# Per data type reduction of responses as they arrive
+REDUCERS = {
+    'injuries': store_injury_fragment,
+}
+
+
+def data_type_of(kind):
+    """
+    Data type of a stored kind; fixture detail batches are stored as `fixture_details_<batch key>`.
+    """
+    return 'fixture_details' if kind.startswith('fixture_details_') else kind
+
+
+def request_page(endpoint, label, client, limiter, telemetry=None, tags=None):
+    """
+    Request one page under the limiter. With `telemetry` the request is recorded with `tags`
+    (endpoint, league, season), its status, size, latency and the time spent waiting on the limiter.
+    """
+    # Rate limiting, shared by all workers
+    start = time.perf_counter()
+    acquired = limiter.acquire()
+    sleep = time.perf_counter() - start
+    if not acquired:
+        error = f"Daily request budget exhausted before {label}."
+        logging.info(error)
+        if telemetry is not None:
+            telemetry.record(status='budget_exhausted', cache='miss', sleep=sleep, **tags)
+        return None, error
+
+    start = time.perf_counter()
+    try:
+        status, data_dict, nbytes = client.request(endpoint)
+    except Exception:
+        if telemetry is not None:
+            telemetry.record(status='exception', cache='miss', latency=time.perf_counter() - start, sleep=sleep,
+                             **tags)
+        raise
+    if telemetry is not None:
+        telemetry.record(status=str(status) if status != 200 or not data_dict.get("errors") else 'api_error',
+                         cache='miss', latency=time.perf_counter() - start, nbytes=nbytes, sleep=sleep, **tags)
+
+    if status != 200:
+        error = f"HTTP {status} for {label}."
+        logging.error(error)
+        return None, error
+
+    # Check for errors in the response
+    if data_dict.get("errors"):
+        error = f"Error in response for {label}: {data_dict['errors']}"
+        logging.error(error)
+        return None, error
+
+    return data_dict, None
+
+
+def request_pages(endpoint, label, client, limiter, telemetry=None, tags=None):
+    """
+    Request the first page of an endpoint and, if `paging.total` is larger than one, the other
+    pages concurrently under the same limiter. The pages are joined in order into one response.
+    """
+    data_dict, error = request_page(endpoint, label, client, limiter, telemetry, tags)
+    if error is not None:
+        return None, error
+
+    total = (data_dict.get('paging') or {}).get('total') or 1
+    if total == 1:
+        return data_dict, None
+
+    separator = '&' if '?' in endpoint else '?'
+    with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, total - 1)) as executor:
+        pages = list(executor.map(lambda page: request_page(f"{endpoint}{separator}page={page}",
+                                                            f"{label} page {page}", client, limiter,
+                                                            telemetry, tags),
+                                  range(2, total + 1)))
+
+    for page_dict, error in pages:
+        if error is not None:
+            return None, error
+        data_dict['response'].extend(page_dict['response'])
+    data_dict['paging'] = {'current': 1, 'total': total}
+    data_dict['results'] = len(data_dict['response'])
+    logging.info(f"Joined {total} pages for {label}.")
+    return data_dict, None
+
+
+def request_data(country, league_name, league_id, season, data_type, client, limiter, manifest, params=None,
+                 telemetry=None):
     if data_type == "standings":
-        file_path = os.path.join(directory_path, 'league_data.json')
         endpoint = f"/standings?league={league_id}&season={season}"
     elif data_type == "fixtures":
-        file_path = os.path.join(directory_path, 'fixtures_data.json')
         endpoint = f"/fixtures?league={league_id}&season={season}"
+    elif data_type == "injuries":
+        endpoint = f"/injuries?league={league_id}&season={season}"
+    elif data_type_of(data_type) == "fixture_details":
+        endpoint = f"/fixtures?ids={'-'.join(str(fixture_id) for fixture_id in params['ids'])}"
     else:
-        logging.error(f"Unknown data_type {data_type} for {league_name} {season}.")
-        return None, request_counter, start_time, False
+        error = f"Unknown data_type {data_type} for {league_name} {season}."
+        logging.error(error)
+        return None, error
 
-    if os.path.isfile(file_path):
+    tags = {'endpoint': data_type_of(data_type), 'league': league_name, 'season': season}
+    if raw_exists(country, league_name, season, data_type):
         try:
-            with open(file_path, 'r') as file:
-                data_dict = json.load(file)
-            logging.info(f"Loaded {data_type} data from existing file for {league_name} {season}.")
-            return data_dict, request_counter, start_time, True
-        except (ValueError, json.JSONDecodeError) as e:
+            start = time.perf_counter()
+            data_dict = read_raw(country, league_name, season, data_type)
+            manifest.adopt(country, league_name, season, data_type, data_dict)
+            if not manifest.needs_refresh(country, league_name, season, data_type):
+                logging.info(f"Loaded {data_type} data from existing file for {league_name} {season}.")
+                if telemetry is not None:
+                    telemetry.record(status='cached', cache='hit', latency=time.perf_counter() - start, **tags)
+                return data_dict, None
+            logging.info(f"Stored {data_type} data for {league_name} {season} is stale, refreshing.")
+        except (ValueError, OSError, EOFError) as e:
             logging.error(f"Error loading {data_type} data from file for {league_name} {season}: {e}")
             # Proceed to request new data if loading fails
 
-    # Rate limiting
-    if request_counter >= 10:
-        elapsed_time = time.time() - start_time
-        if elapsed_time < 60:
-            logging.info(f"Rate limit approached, sleeping for {round((60 - elapsed_time), 2)} seconds")
-            time.sleep(60 - elapsed_time)
-        request_counter = 0
-        start_time = time.time()
-
     try:
-        context = ssl.create_default_context(cafile=certifi.where())
-        conn = http.client.HTTPSConnection("v3.football.api-sports.io", context=context)
-        headers = {
-            'x-rapidapi-host': "v3.football.api-sports.io",
-            'x-rapidapi-key': api_key
-        }
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        data_dict = json.loads(data.decode("utf-8"))
-
-        # Check for errors in the response
-        if data_dict.get("errors"):
-            logging.error(f"Error in response for {league_name} {season} ({data_type}): {data_dict['errors']}")
-            return None, request_counter, start_time, False
+        data_dict, error = request_pages(endpoint, f"{league_name} {season} ({data_type})", client, limiter,
+                                         telemetry, tags)
+        if error is not None:
+            return None, error
 
         # Check if the response is empty
         if not data_dict['response']:
             logging.info(f"No data in response for {league_name} {season} ({data_type}).")
 
         # Save the data even if it's empty (if no error occurred)
-        os.makedirs(directory_path, exist_ok=True)
-        with open(file_path, 'w') as file:
-            json.dump(data_dict, file, indent=4)
-        logging.info(f"Requested new {data_type} data and saved to file for {league_name} {season}.")
-
-        request_counter += 1
+        write_raw(country, league_name, season, data_type, data_dict)
+        if manifest.record(country, league_name, season, data_type, data_dict):
+            logging.info(f"Requested new {data_type} data and saved to file for {league_name} {season}.")
+        else:
+            logging.info(f"Requested {data_type} data for {league_name} {season}, unchanged since last fetch.")
     except Exception as e:
-        logging.error(f"Error requesting {data_type} data for {league_name} {season}: {e}")
-        return None, request_counter, start_time, False
+        error = f"Error requesting {data_type} data for {league_name} {season}: {e}"
+        logging.error(error)
+        return None, error
 
-    return data_dict, request_counter, start_time, True
+    return data_dict, None
 
 
-def request_raw_data(country):
-    mappings_file = os.path.join('settings', f'mapping_{country.lower()}.yaml')
-    mappings = load_mappings_from_yaml(mappings_file)
-    api_key = load_api_key(os.path.join(project_root(), 'credentials', 'api_key.txt'))
-
-    request_counter = 0
-    start_time = time.time()
-
+def build_requests(mappings):
+    """
+    Flatten the league mapping into (league_name, league_id, season, data_type) tasks,
+    in the same order the sequential loader used to walk them. A `<data_type>_start` key
+    in the mapping skips the seasons before the API covers that data type.
+    """
+    tasks = []
     for league_name, league_info in mappings.items():
         league_id = league_info['id']
         season_start = league_info['season_start']
@@ -93,21 +174,97 @@ def request_raw_data(country):
         data_types = league_info.get('data_types', [])
 
         for season in range(season_start, season_end + 1):
-            logging.info(f"Processing {league_name} for the {season} season.")
             for data_type in data_types:
-                logging.info(f"Requesting {data_type} data for {league_name} {season}.")
-                result, request_counter, start_time, continue_processing = request_data(country,
-                                                                                        league_name,
-                                                                                        str(league_id),
-                                                                                        str(season),
-                                                                                        data_type,
-                                                                                        request_counter,
-                                                                                        start_time,
-                                                                                        api_key)
-                if not continue_processing:
-                    logging.info(
-                        f"Stopping further requests due to error in response for {league_name} {season} ({data_type}).")
-                    return
+                if season < league_info.get(f'{data_type}_start', season_start):
+                    continue
+                tasks.append((league_name, str(league_id), str(season), data_type))
+    return tasks
+
+
+def run_jobs(queue, client, limiter, manifest, workers=MAX_WORKERS, reducers=None, telemetry=None, name=None):
+    """
+    Work through the job queue with `workers` threads. Failed requests are retried with backoff
+    while the other workers carry on; the run stops early only when the daily budget is used up.
+
+    `reducers` maps a data type to a function (country, league_name, season, data_dict) that is
+    called with every response of that type as soon as it is available.
+
+    Every request is recorded in `telemetry`; with a `name` its summary is written to
+    data/raw/telemetry as `<name>_summary.json` and the Prometheus textfile `<name>.prom`.
+    """
+    if reducers is None:
+        reducers = REDUCERS
+    if telemetry is None:
+        telemetry = Telemetry()
+
+    def work():
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            logging.info(f"Requesting {job['kind']} data for {job['league']} {job['season']}.")
+            result, error = request_data(job['country'], job['league'], job['league_id'], job['season'],
+                                         job['kind'], client, limiter, manifest, job.get('params'), telemetry)
+            reducer = reducers.get(data_type_of(job['kind']))
+            if error is None and reducer is not None:
+                try:
+                    reducer(job['country'], job['league'], job['season'], result)
+                except Exception as e:
+                    error = f"Error reducing {job['kind']} data for {job['league']} {job['season']}: {e}"
+                    logging.error(error)
+            if error is None:
+                queue.complete(job)
+            elif limiter.remaining_today() <= 0:
+                queue.release(job)
+                queue.stop()
+            elif queue.fail(job, error) == 'dead':
+                logging.error(f"Giving up on {job['kind']} data for {job['league']} {job['season']} "
+                              f"after {job['attempts']} attempts.")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(workers):
+            executor.submit(work)
+
+    counts = queue.counts()
+    logging.info(f"Finished requests: {counts}")
+    for job in queue.dead_letters():
+        logging.info(f"Dead letter: {job['kind']} data for {job['country']} {job['league']} {job['season']}: "
+                     f"{job['last_error']}")
+
+    if name is not None:
+        summary = telemetry.write(name, limiter)
+        logging.info(f"Telemetry: {summary['requests']} requests, cache hit ratio {summary['cache_hit_ratio']}, "
+                     f"{summary['bytes']} bytes, {summary['limiter_sleep_seconds']}s waiting on the limiter.")
+    return counts
+
+
+def request_raw_data(country, workers=MAX_WORKERS, limiter=None, client=None, manifest=None, queue=None,
+                     retry_dead=False, reducers=None):
+    """
+    Request all raw data for a country with `workers` requests in flight.
+
+    All workers draw from one token bucket and one pool of keep-alive connections;
+    pass the same `limiter` and `client` to several calls to share them across countries.
+    Stored seasons are only requested again when the manifest marks them as stale and in progress.
+    Requests are tracked in a persistent job queue, so a failed or interrupted run resumes
+    where it stopped; requests that failed too often are only retried with `retry_dead`.
+    """
+    mappings_file = os.path.join('settings', f'mapping_{country.lower()}.yaml')
+    mappings = load_mappings_from_yaml(mappings_file)
+    if client is None:
+        api_key = load_api_key(os.path.join(project_root(), 'credentials', 'api_key.txt'))
+        client = ApiClient(api_key, pool_size=workers)
+    if limiter is None:
+        limiter = TokenBucket()
+    if manifest is None:
+        manifest = Manifest()
+    if queue is None:
+        queue = JobQueue(jobs_path(f'jobs_{country.lower()}'))
+
+    for league_name, league_id, season, data_type in build_requests(mappings):
+        queue.add(country, league_name, league_id, season, data_type, retry_dead=retry_dead)
+
+    return run_jobs(queue, client, limiter, manifest, workers, reducers, name=f'ingestion_{country.lower()}')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import date
+from data.raw.store import raw_root, raw_exists, raw_mtime, read_raw
+
+# Fixture statuses after which a match will not change anymore
+FINISHED_STATUSES = {'FT', 'AET', 'PEN', 'CANC', 'ABD', 'AWD', 'WO'}
+
+# In-progress seasons are re-fetched once their stored copy is older than this
+REFRESH_AFTER = 24 * 60 * 60
+
+
+def manifest_path():
+    return os.path.join(raw_root(), 'manifest.json')
+
+
+def response_hash(data_dict):
+    payload = json.dumps(data_dict.get('response'), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fixtures_finished(data_dict):
+    fixtures = data_dict.get('response') or []
+    return bool(fixtures) and all(fixture['fixture']['status']['short'] in FINISHED_STATUSES
+                                  for fixture in fixtures)
+
+
+class Manifest:
+    """
+    JSON index of the raw store with, per country/league/season/kind, the fetch time,
+    the response hash and whether the season is finished.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or manifest_path()
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file)
+
+    @staticmethod
+    def key(country, league, season, kind):
+        return f'{country}/{league}/{season}/{kind}'
+
+    def get(self, country, league, season, kind):
+        with self.lock:
+            return self.entries.get(self.key(country, league, season, kind))
+
+    def season_finished(self, country, league, season, kind, data_dict):
+        """
+        A season is finished once all its fixtures are played, or once it lies two calendar
+        years back. Standings follow the fixtures entry of the same league and season.
+        """
+        if int(season) + 2 <= date.today().year or kind.startswith('fixture_details'):
+            # Fixture details are only requested for fixtures that are already played
+            return True
+        if kind == 'fixtures':
+            return fixtures_finished(data_dict)
+        fixtures_entry = self.get(country, league, season, 'fixtures')
+        return bool(fixtures_entry and fixtures_entry['finished'])
+
+    def needs_refresh(self, country, league, season, kind, now=None):
+        entry = self.get(country, league, season, kind)
+        if entry is None:
+            return True
+        if entry['finished']:
+            return False
+        return (now or time.time()) - entry['fetched_at'] > REFRESH_AFTER
+
+    def adopt(self, country, league, season, kind, data_dict=None):
+        """
+        Record a file stored before the manifest existed, with its modification time as fetch time.
+        """
+        if self.get(country, league, season, kind) is not None:
+            return
+        if data_dict is None:
+            data_dict = read_raw(country, league, season, kind)
+        self.record(country, league, season, kind, data_dict, fetched_at=raw_mtime(country, league, season, kind))
+
+    def is_due(self, country, league, season, kind):
+        """
+        True if a request is needed: nothing is stored yet, or the stored season is in progress and stale.
+        """
+        if not raw_exists(country, league, season, kind):
+            return True
+        self.adopt(country, league, season, kind)
+        return self.needs_refresh(country, league, season, kind)
+
+    def record(self, country, league, season, kind, data_dict, fetched_at=None):
+        """
+        Record a stored response and persist the manifest.
+
+        Returns:
+        - bool: True if the response differs from the previously recorded one.
+        """
+        entry = {
+            'fetched_at': fetched_at or time.time(),
+            'hash': response_hash(data_dict),
+            'finished': self.season_finished(country, league, season, kind, data_dict),
+            'results': len(data_dict.get('response') or []),
+        }
+        with self.lock:
+            previous = self.entries.get(self.key(country, league, season, kind))
+            self.entries[self.key(country, league, season, kind)] = entry
+            self._save()
+        return previous is None or previous['hash'] != entry['hash']
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
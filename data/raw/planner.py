@@ -0,0 +1,94 @@
+import os
+import math
+import logging
+from datetime import date
+from utils.load import load_mappings_from_yaml, load_league_mappings, load_api_key, project_root
+from data.raw.client import ApiClient
+from data.raw.jobs import JobQueue, jobs_path
+from data.raw.limiter import TokenBucket, REQUESTS_PER_MINUTE, REQUESTS_PER_DAY
+from data.raw.loader import build_requests, run_jobs, MAX_WORKERS
+from data.raw.manifest import Manifest
+
+
+def request_priority(league_info, season, kind, current_season):
+    """
+    Sort key of a request: the current season first, then cups before divisions from top to bottom,
+    then the most recent seasons, fixtures before standings.
+    """
+    division = league_info['division']
+    division_order = 0 if division == 'NaN' else int(division)
+    kind_order = 0 if kind == 'fixtures' else 1
+    return (0 if int(season) >= current_season else 1, division_order, -int(season), kind_order)
+
+
+def plan_requests(countries=None, manifest=None, current_season=None):
+    """
+    Collect the missing and stale requests of every country in settings/mapping.yaml.
+
+    Returns:
+    - list: (priority, country, league_name, league_id, season, data_type) tuples, highest priority first.
+    """
+    if countries is None:
+        countries = list(load_mappings_from_yaml('settings/mapping.yaml')['countries'])
+    if manifest is None:
+        manifest = Manifest()
+    if current_season is None:
+        today = date.today()
+        current_season = today.year if today.month >= 7 else today.year - 1
+
+    plan = []
+    for country in countries:
+        mappings = load_league_mappings(country)
+        for league_name, league_id, season, data_type in build_requests(mappings):
+            if manifest.is_due(country, league_name, season, data_type):
+                priority = request_priority(mappings[league_name], season, data_type, current_season)
+                plan.append((priority, country, league_name, league_id, season, data_type))
+    return sorted(plan)
+
+
+def estimate_cost(plan, per_minute=REQUESTS_PER_MINUTE, per_day=REQUESTS_PER_DAY):
+    """
+    Print the number of planned requests per country and kind and the time the budget needs for them.
+    """
+    counts = {}
+    for _, country, _, _, _, data_type in plan:
+        counts[(country, data_type)] = counts.get((country, data_type), 0) + 1
+
+    print("Planned requests:")
+    for (country, data_type), count in sorted(counts.items()):
+        print(f"  {country:<12} {data_type:<10} {count}")
+    print(f"  {'Total':<23} {len(plan)}")
+
+    days = math.ceil(len(plan) / per_day) if plan else 0
+    minutes = len(plan) / per_minute
+    print(f"Budget of {per_minute}/minute and {per_day}/day: {days} day(s), "
+          f"at least {round(minutes, 1)} minutes of requests.")
+    if plan:
+        first = plan[0]
+        print(f"First request: {first[5]} for {first[1]} {first[2]} {first[4]}.")
+    return {'requests': len(plan), 'days': days, 'minutes': minutes}
+
+
+def execute_plan(plan, workers=MAX_WORKERS, limiter=None, client=None, manifest=None, queue=None):
+    """
+    Run the planned requests of all countries against one shared budget, in priority order.
+    """
+    if client is None:
+        api_key = load_api_key(os.path.join(project_root(), 'credentials', 'api_key.txt'))
+        client = ApiClient(api_key, pool_size=workers)
+    if limiter is None:
+        limiter = TokenBucket()
+    if manifest is None:
+        manifest = Manifest()
+    if queue is None:
+        queue = JobQueue(jobs_path('jobs_plan'))
+
+    for rank, (_, country, league_name, league_id, season, data_type) in enumerate(plan):
+        queue.add(country, league_name, league_id, season, data_type, priority=rank)
+
+    logging.info(f"Executing {len(plan)} planned requests with {limiter.remaining_today()} left in today's budget.")
+    return run_jobs(queue, client, limiter, manifest, workers, name='ingestion_plan')
+
+
+if __name__ == "__main__":
+    estimate_cost(plan_requests())
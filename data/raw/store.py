@@ -0,0 +1,186 @@
+import os
+import gzip
+import json
+import logging
+from utils.load import project_root
+
+# Environment variable that points the raw store at another directory, e.g. for benchmarks
+RAW_ROOT_ENV = 'FOOTBALL_RAW_ROOT'
+
+# Stem of the stored file per kind of API response
+RAW_FILES = {
+    'fixtures': 'fixtures_data',
+    'standings': 'league_data',
+    'injuries': 'injuries_data',
+}
+
+
+# Flat columns kept from every item of a /fixtures response, with their path in the item
+FIXTURE_FIELDS = {
+    'fixture_id': ('fixture', 'id'),
+    'fixture_date': ('fixture', 'date'),
+    'fixture_length': ('fixture', 'status', 'elapsed'),
+    'venue_name': ('fixture', 'venue', 'name'),
+    'venue_city': ('fixture', 'venue', 'city'),
+    'league_name': ('league', 'name'),
+    'round': ('league', 'round'),
+    'home_id': ('teams', 'home', 'id'),
+    'home_name': ('teams', 'home', 'name'),
+    'home_winner': ('teams', 'home', 'winner'),
+    'away_id': ('teams', 'away', 'id'),
+    'away_name': ('teams', 'away', 'name'),
+    'away_winner': ('teams', 'away', 'winner'),
+    'home_goals': ('goals', 'home'),
+    'away_goals': ('goals', 'away'),
+}
+
+
+def raw_root():
+    return os.environ.get(RAW_ROOT_ENV) or os.path.join(project_root(), 'data', 'raw')
+
+
+def raw_dir(country, league, season):
+    return os.path.join(raw_root(), country, league, str(season))
+
+
+def raw_path(country, league, season, kind):
+    return os.path.join(raw_dir(country, league, season), f'{RAW_FILES.get(kind, kind)}.ndjson.gz')
+
+
+def legacy_path(country, league, season, kind):
+    return os.path.join(raw_dir(country, league, season), f'{RAW_FILES.get(kind, kind)}.json')
+
+
+def raw_exists(country, league, season, kind):
+    return os.path.isfile(raw_path(country, league, season, kind)) or \
+        os.path.isfile(legacy_path(country, league, season, kind))
+
+
+def raw_mtime(country, league, season, kind):
+    file_path = raw_path(country, league, season, kind)
+    if not os.path.isfile(file_path):
+        file_path = legacy_path(country, league, season, kind)
+    return os.path.getmtime(file_path)
+
+
+def write_raw(country, league, season, kind, data_dict):
+    """
+    Store an API response as gzip-compressed NDJSON: the first line holds the response
+    envelope (get, parameters, errors, results, paging), every following line one item of `response`.
+    """
+    file_path = raw_path(country, league, season, kind)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    envelope = {key: value for key, value in data_dict.items() if key != 'response'}
+    tmp_path = f'{file_path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        file.write(json.dumps(envelope, separators=(',', ':')) + '\n')
+        for item in data_dict.get('response') or []:
+            file.write(json.dumps(item, separators=(',', ':')) + '\n')
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def iter_raw(country, league, season, kind):
+    """
+    Yield the items of a stored response one at a time.
+    """
+    file_path = raw_path(country, league, season, kind)
+    if not os.path.isfile(file_path):
+        data_dict = read_raw(country, league, season, kind)
+        yield from (data_dict['response'] if data_dict else [])
+        return
+
+    with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+        file.readline()
+        for line in file:
+            yield json.loads(line)
+
+
+def read_columns(country, league, season, kind, fields):
+    """
+    Stream a stored response item by item and keep only `fields`, a mapping of column name
+    to the key path inside an item, in one list per column. Only one item is decoded at a time,
+    so peak memory follows the kept columns rather than the full response. Legacy JSON files
+    are still loaded whole.
+
+    Returns:
+    - dict or None: Column name to list of values, None if nothing is stored.
+    """
+    if not raw_exists(country, league, season, kind):
+        return None
+
+    columns = {column: [] for column in fields}
+    paths = [(columns[column], path) for column, path in fields.items()]
+    for item in iter_raw(country, league, season, kind):
+        for values, path in paths:
+            value = item
+            for key in path:
+                value = value.get(key) if value is not None else None
+            values.append(value)
+    return columns
+
+
+def read_raw(country, league, season, kind):
+    """
+    Load a stored response as the original API dict, falling back to the legacy
+    indented JSON file for trees that have not been migrated yet.
+
+    Returns:
+    - dict or None: The API response, None if nothing is stored.
+    """
+    file_path = raw_path(country, league, season, kind)
+    if os.path.isfile(file_path):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+            data_dict = json.loads(file.readline())
+            data_dict['response'] = [json.loads(line) for line in file]
+        return data_dict
+
+    file_path = legacy_path(country, league, season, kind)
+    if os.path.isfile(file_path):
+        with open(file_path, 'r') as file:
+            return json.load(file)
+    return None
+
+
+def migrate_raw_tree(remove_legacy=True):
+    """
+    One-shot conversion of every legacy `*_data.json` file under data/raw into the compressed store.
+    """
+    root = raw_root()
+    kinds = {f'{stem}.json': kind for kind, stem in RAW_FILES.items()}
+    saved_bytes = 0
+
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            if file_name not in kinds:
+                continue
+            league_dir, season = os.path.split(directory)
+            country_dir, league = os.path.split(league_dir)
+            country = os.path.basename(country_dir)
+            kind = kinds[file_name]
+
+            legacy_file = os.path.join(directory, file_name)
+            try:
+                with open(legacy_file, 'r') as file:
+                    data_dict = json.load(file)
+            except (ValueError, json.JSONDecodeError) as e:
+                logging.error(f"Skipping unreadable file {legacy_file}: {e}")
+                continue
+
+            new_file = write_raw(country, league, season, kind, data_dict)
+            if read_raw(country, league, season, kind) != data_dict:
+                logging.error(f"Round trip mismatch for {legacy_file}, keeping the original.")
+                os.remove(new_file)
+                continue
+
+            saved_bytes += os.path.getsize(legacy_file) - os.path.getsize(new_file)
+            if remove_legacy:
+                os.remove(legacy_file)
+            logging.info(f"Migrated {kind} data for {country} {league} {season}.")
+
+    logging.info(f"Raw store migration finished, saved {round(saved_bytes / 1e6, 1)} MB.")
+
+
+if __name__ == "__main__":
+    migrate_raw_tree()
@@ -0,0 +1,214 @@
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from utils.load import load_mappings_from_yaml, load_league_mappings
+from data.raw.store import read_raw
+
+RAW_KINDS = {'/fixtures': 'fixtures', '/standings': 'standings', '/injuries': 'injuries'}
+
+
+def league_index():
+    """
+    Map every API-Football league id in the settings to its (country, league name).
+    """
+    index = {}
+    for country in load_mappings_from_yaml('settings/mapping.yaml')['countries']:
+        for league_name, league_info in load_league_mappings(country).items():
+            index[str(league_info['id'])] = (country, league_name)
+    return index
+
+
+def synthetic_teams(league_id, n_teams=18):
+    return [{'id': int(league_id) * 100 + i, 'name': f'Team {league_id}-{i}'} for i in range(n_teams)]
+
+
+def synthetic_fixtures(league_id, season, n_teams=18):
+    """
+    Double round robin in the shape of an API-Football /fixtures response.
+    """
+    rng = random.Random(f'{league_id}-{season}')
+    teams = synthetic_teams(league_id, n_teams)
+    start = datetime(int(season), 8, 1, 15, 30)
+    fixtures = []
+    for round_number in range(1, 2 * (n_teams - 1) + 1):
+        rng.shuffle(teams)
+        for home, away in zip(teams[::2], teams[1::2]):
+            home_goals, away_goals = rng.randint(0, 4), rng.randint(0, 4)
+            fixtures.append({
+                'fixture': {
+                    'id': int(league_id) * 10 ** 6 + int(season) % 100 * 10 ** 4 + len(fixtures),
+                    'date': (start + timedelta(days=7 * round_number)).strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                    'venue': {'name': f"{home['name']} Stadium", 'city': f"{home['name']} City"},
+                    'status': {'short': 'FT', 'elapsed': 90},
+                },
+                'league': {'id': int(league_id), 'name': f'League {league_id}', 'season': int(season),
+                           'round': f'Regular Season - {round_number}'},
+                'teams': {
+                    'home': dict(home, winner=None if home_goals == away_goals else home_goals > away_goals),
+                    'away': dict(away, winner=None if home_goals == away_goals else away_goals > home_goals),
+                },
+                'goals': {'home': home_goals, 'away': away_goals},
+            })
+    return fixtures
+
+
+def synthetic_standings(league_id, season, n_teams=18):
+    rng = random.Random(f'{league_id}-{season}')
+    table = []
+    for rank, team in enumerate(synthetic_teams(league_id, n_teams), start=1):
+        win, draw = rng.randint(5, 20), rng.randint(3, 10)
+        goals_for, goals_against = rng.randint(25, 80), rng.randint(25, 80)
+        table.append({
+            'rank': rank,
+            'team': team,
+            'points': 3 * win + draw,
+            'goalsDiff': goals_for - goals_against,
+            'all': {'played': 34, 'win': win, 'draw': draw, 'lose': 34 - win - draw,
+                    'goals': {'for': goals_for, 'against': goals_against}},
+        })
+    return [{'league': {'id': int(league_id), 'season': int(season), 'standings': [table]}}]
+
+
+def synthetic_injuries(league_id, season, n_teams=18):
+    rng = random.Random(f'{league_id}-{season}')
+    injuries = []
+    for fixture in synthetic_fixtures(league_id, season, n_teams)[::5]:
+        for side in ('home', 'away'):
+            team = fixture['teams'][side]
+            injuries.append({
+                'player': {'id': rng.randint(1, 10 ** 5), 'name': 'Player', 'type': 'Missing Fixture',
+                           'reason': 'Injury'},
+                'team': {'id': team['id'], 'name': team['name']},
+                'fixture': {'id': fixture['fixture']['id'], 'date': fixture['fixture']['date']},
+                'league': {'id': int(league_id), 'season': int(season)},
+            })
+    return injuries
+
+
+def synthetic_fixture_details(ids):
+    """
+    /fixtures?ids= response with lineups, substitution events and statistics for every id.
+    """
+    details = []
+    for fixture_id in ids:
+        rng = random.Random(fixture_id)
+        teams = {'home': {'id': rng.randint(1, 10 ** 4), 'name': 'Home'},
+                 'away': {'id': rng.randint(1, 10 ** 4), 'name': 'Away'}}
+        details.append({
+            'fixture': {'id': int(fixture_id), 'status': {'short': 'FT', 'elapsed': 90}},
+            'teams': teams,
+            'lineups': [{'team': team, 'formation': rng.choice(['4-4-2', '4-3-3', '3-5-2']),
+                         'coach': {'id': rng.randint(1, 10 ** 4)},
+                         'startXI': [{'player': {'id': rng.randint(1, 10 ** 6)}} for _ in range(11)]}
+                        for team in teams.values()],
+            'events': [{'team': teams[rng.choice(['home', 'away'])], 'type': 'subst'}
+                       for _ in range(rng.randint(0, 10))],
+            'statistics': [{'team': team, 'statistics': [
+                {'type': 'Total Shots', 'value': rng.randint(3, 25)},
+                {'type': 'Ball Possession', 'value': f'{rng.randint(30, 70)}%'},
+                {'type': 'Fouls', 'value': rng.randint(5, 20)},
+                {'type': 'Red Cards', 'value': None},
+            ]} for team in teams.values()],
+        })
+    return details
+
+
+SYNTHETIC = {'fixtures': synthetic_fixtures, 'standings': synthetic_standings, 'injuries': synthetic_injuries}
+
+
+def make_handler(source='store', latency=0.0, rate_429=0.0, error_rate=0.0, page_size=None):
+    """
+    Build a request handler that answers like API-Football.
+
+    `source` is 'store' to serve what is under data/raw (synthetic when nothing is stored)
+    or 'synthetic' to always generate payloads. `latency` is added to every response,
+    `rate_429` and `error_rate` are the probabilities of a 429 or an `errors` payload.
+    With `page_size` responses are split into pages selected by the `page` parameter.
+    """
+    leagues = league_index()
+
+    class ApiFootballHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+            if gzipped:
+                body = gzip.compress(body)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            url = urlparse(self.path)
+            kind = RAW_KINDS.get(url.path)
+            if kind is None:
+                self.send_json(404, {'errors': {'endpoint': f'Unknown endpoint {url.path}'}, 'response': []})
+                return
+            if random.random() < rate_429:
+                self.send_json(429, {'errors': {'rateLimit': 'Too many requests'}, 'response': []})
+                return
+
+            parameters = {key: values[0] for key, values in parse_qs(url.query).items()}
+            envelope = {'get': kind, 'parameters': parameters, 'errors': [], 'results': 0,
+                        'paging': {'current': 1, 'total': 1}, 'response': []}
+            if random.random() < error_rate:
+                envelope['errors'] = {'requests': 'Injected error'}
+                self.send_json(200, envelope)
+                return
+
+            league_id, season = parameters.get('league'), parameters.get('season')
+            stored = None
+            if source == 'store' and league_id in leagues and kind in RAW_KINDS.values():
+                country, league_name = leagues[league_id]
+                stored = read_raw(country, league_name, season, kind)
+            if stored is not None:
+                envelope['response'] = stored['response']
+            elif kind == 'fixtures' and parameters.get('ids'):
+                envelope['response'] = synthetic_fixture_details(parameters['ids'].split('-'))
+            elif league_id and season:
+                envelope['response'] = SYNTHETIC[kind](league_id, season)
+            if page_size:
+                page = int(parameters.get('page', 1))
+                total = max(1, math.ceil(len(envelope['response']) / page_size))
+                envelope['paging'] = {'current': page, 'total': total}
+                envelope['response'] = envelope['response'][(page - 1) * page_size:page * page_size]
+            envelope['results'] = len(envelope['response'])
+            self.send_json(200, envelope)
+
+    return ApiFootballHandler
+
+
+def start_server(port=0, **handler_options):
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+    - ThreadingHTTPServer: The running server; its address is `server.server_address`.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(**handler_options))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_server(port=8080, latency=0.05)
+    print(f"Serving API-Football stand-in on http://127.0.0.1:{server.server_address[1]}")
+    threading.Event().wait()
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import bisect
+import threading
+from data.raw.store import raw_root
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+
+def telemetry_dir():
+    return os.path.join(raw_root(), 'telemetry')
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense: one counter per upper bound plus sum and count.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, cumulative = 0, []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            cumulative.append((str(bound), total))
+        return cumulative
+
+    def to_dict(self):
+        return {'buckets': dict(self.cumulative()), 'sum': round(self.sum, 6), 'count': self.count}
+
+
+class Telemetry:
+    """
+    Structured per-request metrics of an ingestion run: endpoint, league, season, status, bytes,
+    latency, cache hit or miss and the time spent waiting on the rate limiter.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.started_at = time.time()
+
+    def record(self, endpoint, league, season, status, cache, latency=0.0, nbytes=0, sleep=0.0):
+        with self.lock:
+            self.events.append({'endpoint': endpoint, 'league': league, 'season': str(season), 'status': status,
+                                'cache': cache, 'latency': latency, 'bytes': nbytes, 'sleep': sleep})
+
+    def summary(self, limiter=None):
+        """
+        Aggregate the events into per-endpoint histograms and totals.
+
+        Returns:
+        - dict: Machine-readable summary of the run.
+        """
+        with self.lock:
+            events = list(self.events)
+
+        endpoints = {}
+        for event in events:
+            endpoint = endpoints.setdefault(event['endpoint'], {
+                'latency_seconds': Histogram(LATENCY_BUCKETS), 'response_bytes': Histogram(BYTES_BUCKETS),
+                'status': {}, 'cache_hits': 0, 'cache_misses': 0, 'limiter_sleep_seconds': 0.0})
+            endpoint['status'][event['status']] = endpoint['status'].get(event['status'], 0) + 1
+            if event['cache'] == 'hit':
+                endpoint['cache_hits'] += 1
+                continue
+            endpoint['cache_misses'] += 1
+            endpoint['latency_seconds'].observe(event['latency'])
+            endpoint['response_bytes'].observe(event['bytes'])
+            endpoint['limiter_sleep_seconds'] += event['sleep']
+
+        hits = sum(endpoint['cache_hits'] for endpoint in endpoints.values())
+        summary = {
+            'started_at': self.started_at,
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'requests': len(events),
+            'cache_hit_ratio': round(hits / len(events), 4) if events else None,
+            'network_seconds': round(sum(e['latency'] for e in events if e['cache'] == 'miss'), 3),
+            'limiter_sleep_seconds': round(sum(e['sleep'] for e in events), 3),
+            'bytes': sum(e['bytes'] for e in events),
+            'endpoints': {name: dict(endpoint,
+                                     latency_seconds=endpoint['latency_seconds'].to_dict(),
+                                     response_bytes=endpoint['response_bytes'].to_dict(),
+                                     limiter_sleep_seconds=round(endpoint['limiter_sleep_seconds'], 3))
+                          for name, endpoint in endpoints.items()},
+        }
+        if limiter is not None:
+            summary['quota'] = {'per_minute': limiter.per_minute, 'per_day': limiter.per_day,
+                                'used': limiter.per_day - limiter.remaining_today(),
+                                'remaining': limiter.remaining_today()}
+        return summary
+
+    def write(self, name, limiter=None):
+        """
+        Write the summary as JSON, the events as NDJSON and a Prometheus textfile to data/raw/telemetry.
+        """
+        summary = self.summary(limiter)
+        os.makedirs(telemetry_dir(), exist_ok=True)
+
+        with open(os.path.join(telemetry_dir(), f'{name}_summary.json'), 'w') as file:
+            json.dump(summary, file, indent=2)
+        with open(os.path.join(telemetry_dir(), f'{name}_requests.ndjson'), 'w') as file:
+            for event in self.events:
+                file.write(json.dumps(event) + '\n')
+
+        prom_path = os.path.join(telemetry_dir(), f'{name}.prom')
+        with open(f'{prom_path}.tmp', 'w') as file:
+            file.write(prometheus_text(summary, name))
+        os.replace(f'{prom_path}.tmp', prom_path)
+        return summary
+
+
+def prometheus_text(summary, run):
+    lines = [
+        '# HELP football_ingestion_request_seconds Latency of API requests that missed the cache.',
+        '# TYPE football_ingestion_request_seconds histogram',
+    ]
+    for name, endpoint in summary['endpoints'].items():
+        labels = f'run="{run}",endpoint="{name}"'
+        histogram = endpoint['latency_seconds']
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'football_ingestion_request_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'football_ingestion_request_seconds_sum{{{labels}}} {histogram["sum"]}')
+        lines.append(f'football_ingestion_request_seconds_count{{{labels}}} {histogram["count"]}')
+
+    lines += ['# HELP football_ingestion_response_bytes Size of API responses on the wire.',
+              '# TYPE football_ingestion_response_bytes histogram']
+    for name, endpoint in summary['endpoints'].items():
+        labels = f'run="{run}",endpoint="{name}"'
+        histogram = endpoint['response_bytes']
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'football_ingestion_response_bytes_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'football_ingestion_response_bytes_sum{{{labels}}} {histogram["sum"]}')
+        lines.append(f'football_ingestion_response_bytes_count{{{labels}}} {histogram["count"]}')
+
+    lines += ['# HELP football_ingestion_requests_total Requests by endpoint and status.',
+              '# TYPE football_ingestion_requests_total counter']
+    for name, endpoint in summary['endpoints'].items():
+        for status, count in endpoint['status'].items():
+            lines.append(f'football_ingestion_requests_total{{run="{run}",endpoint="{name}",status="{status}"}} '
+                         f'{count}')
+
+    lines += ['# HELP football_ingestion_cache_total Stored responses that were reused or requested.',
+              '# TYPE football_ingestion_cache_total counter']
+    for name, endpoint in summary['endpoints'].items():
+        lines.append(f'football_ingestion_cache_total{{run="{run}",endpoint="{name}",result="hit"}} '
+                     f'{endpoint["cache_hits"]}')
+        lines.append(f'football_ingestion_cache_total{{run="{run}",endpoint="{name}",result="miss"}} '
+                     f'{endpoint["cache_misses"]}')
+
+    lines += ['# HELP football_ingestion_limiter_sleep_seconds Time spent waiting on the rate limiter.',
+              '# TYPE football_ingestion_limiter_sleep_seconds gauge',
+              f'football_ingestion_limiter_sleep_seconds{{run="{run}"}} {summary["limiter_sleep_seconds"]}']
+
+    if 'quota' in summary:
+        lines += ['# HELP football_ingestion_quota_used Requests used from the daily budget.',
+                  '# TYPE football_ingestion_quota_used gauge',
+                  f'football_ingestion_quota_used{{run="{run}"}} {summary["quota"]["used"]}',
+                  '# HELP football_ingestion_quota_remaining Requests left in the daily budget.',
+                  '# TYPE football_ingestion_quota_remaining gauge',
+                  f'football_ingestion_quota_remaining{{run="{run}"}} {summary["quota"]["remaining"]}']
+    return '\n'.join(lines) + '\n'
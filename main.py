@@ -3,11 +3,18 @@ import os
 import logging
 
 from data.raw.loader import request_raw_data
+from data.raw.store import migrate_raw_tree
+from data.raw.planner import plan_requests, estimate_cost, execute_plan
 from data.process.data_cup import construct_cup_data
 from data.process.data_league import construct_league_data
+from data.process.pipeline import request_and_parse
+from data.process.parallel import BUILD_WORKERS
+from data.injury.loader import construct_injury_data
+from data.fixture_details.loader import request_fixture_details, construct_fixture_details
 from data.financial.loader import request_financial_data
 from data.distance.loader import request_distance_data
 from data.process.preprocess import preprocess_data
+from utils.storage import table_exists
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,57 +25,126 @@ def run_request_raw_data(country):
     request_raw_data(country)
 
 
-def run_preprocess_data(country, cup):
+def run_pipeline_data(country, cup, workers=BUILD_WORKERS):
+    logging.info(f"Loading and parsing raw data for {country}...")
+    request_and_parse(country)
+    run_preprocess_data(country, cup, workers)
+
+
+def run_request_fixture_details(country):
+    logging.info(f"Loading fixture details for {country}...")
+    request_fixture_details(country)
+    construct_fixture_details(country)
+
+
+def run_plan_raw_data(execute=False):
+    logging.info("Planning raw data requests for all countries...")
+    plan = plan_requests()
+    estimate_cost(plan)
+    if execute:
+        execute_plan(plan)
+
+
+def run_migrate_raw_data():
+    logging.info("Migrating raw JSON files to the compressed raw store...")
+    migrate_raw_tree()
+
+
+def run_preprocess_data(country, cup, workers=BUILD_WORKERS):
     logging.info(f"Analyzing {cup} data...")
-    construct_cup_data(country, cup)
+    construct_cup_data(country, cup, workers)
 
     logging.info(f"Analyzing league data for {country}...")
-    construct_league_data(country)
+    construct_league_data(country, workers)
 
     financial_data_path = os.path.join('data', 'process', country, f'{cup}_financial_data.csv')
-    if not os.path.exists(financial_data_path):
+    if not table_exists(financial_data_path):
         logging.info("Loading financial data...")
         request_financial_data(country)
 
     distance_data_path = os.path.join('data', 'process', country, f'{cup}_distance_data.csv')
-    if not os.path.exists(distance_data_path):
+    if not table_exists(distance_data_path):
         logging.info(f"Calculating distances for {cup} in {country}...")
         request_distance_data(country, cup)
 
+    logging.info(f"Analyzing injury data for {country}...")
+    construct_injury_data(country)
+
     logging.info("Preprocessing all data...")
     preprocess_data(country, cup)
     logging.info("Data processing is finished.")
 
 
+def print_usage():
+    print("Usage: python main.py <command> [options]")
+    print("Commands:")
+    print("  request_raw_data <country>")
+    print("  preprocess_data <country> <cup> [--workers N]")
+    print("  pipeline_data <country> <cup> [--workers N]")
+    print("  request_fixture_details <country>")
+    print("  plan_raw_data [--execute]")
+    print("  migrate_raw_data")
+
+
+def pop_workers(argv):
+    """
+    Remove a `--workers N` option from the arguments.
+
+    Returns:
+    - tuple: The remaining arguments and the number of build processes.
+    """
+    if '--workers' not in argv:
+        return argv, BUILD_WORKERS
+    index = argv.index('--workers')
+    try:
+        workers = int(argv[index + 1])
+    except (IndexError, ValueError):
+        print("--workers expects a number of processes")
+        sys.exit(1)
+    return argv[:index] + argv[index + 2:], workers
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <command> [options]")
-        print("Commands:")
-        print("  request_raw_data <country>")
-        print("  preprocess_data <country> <cup>")
+    argv, workers = pop_workers(sys.argv)
+    if len(argv) < 2:
+        print_usage()
         sys.exit(1)
 
-    command = sys.argv[1]
+    command = argv[1]
 
     if command == "run_request_raw_data":
-        if len(sys.argv) != 3:
+        if len(argv) != 3:
             print("Usage: python main.py request_raw_data <country>")
             sys.exit(1)
-        country = sys.argv[2]
+        country = argv[2]
         run_request_raw_data(country)
     elif command == "run_preprocess_data":
-        if len(sys.argv) != 4:
-            print("Usage: python main.py preprocess_data <country> <cup>")
+        if len(argv) != 4:
+            print("Usage: python main.py preprocess_data <country> <cup> [--workers N]")
+            sys.exit(1)
+        country = argv[2]
+        cup = argv[3]
+        run_preprocess_data(country, cup, workers)
+    elif command == "run_pipeline_data":
+        if len(argv) != 4:
+            print("Usage: python main.py pipeline_data <country> <cup> [--workers N]")
+            sys.exit(1)
+        run_pipeline_data(argv[2], argv[3], workers)
+    elif command == "run_request_fixture_details":
+        if len(argv) != 3:
+            print("Usage: python main.py request_fixture_details <country>")
+            sys.exit(1)
+        run_request_fixture_details(argv[2])
+    elif command == "run_plan_raw_data":
+        if len(argv) not in (2, 3) or (len(argv) == 3 and argv[2] != "--execute"):
+            print("Usage: python main.py plan_raw_data [--execute]")
             sys.exit(1)
-        country = sys.argv[2]
-        cup = sys.argv[3]
-        run_preprocess_data(country, cup)
+        run_plan_raw_data(execute=len(argv) == 3)
+    elif command == "run_migrate_raw_data":
+        run_migrate_raw_data()
     else:
         print(f"Unknown command: {command}")
-        print("Usage: python main.py <command> [options]")
-        print("Commands:")
-        print("  request_raw_data <country>")
-        print("  preprocess_data <country> <cup>")
+        print_usage()
         sys.exit(1)
 
 
@@ -1,6 +1,6 @@
 import os
 import yaml
-import pandas as pd
+from utils.storage import read_table
 
 
 def project_root():
@@ -13,8 +13,11 @@ def load_api_key(file_path):
     return api_key
 
 
-def load_csv(file_path):
-    return pd.read_csv(file_path)
+def load_csv(file_path, columns=None):
+    """
+    Read a table by its CSV path; the typed Parquet file next to it is read instead unless the CSV is newer.
+    """
+    return read_table(file_path, columns)
 
 
 def load_mappings_from_yaml(filename):
@@ -30,7 +33,7 @@ def load_league_mappings(country):
     return league_mappings
 
 
-def load_processed_data(country, cup):
+def load_processed_data(country, cup, columns=None):
     file_path = os.path.join(project_root(), 'data/process', country, f'{cup}_processed.csv')
-    return pd.read_csv(file_path)
+    return read_table(file_path, columns)
 
@@ -0,0 +1,124 @@
+import os
+import pandas as pd
+
+# Declared column types of the data/process tables; columns not listed keep their inferred type.
+# Lower case integer types fall back to the nullable variant when a column has missing values.
+SCHEMAS = {
+    'league_standings': {
+        'league': 'category', 'division': 'Int8', 'year': 'int16', 'position': 'Int16',
+        'team_name': 'category', 'team_id': 'int32', 'points': 'Int16', 'played': 'Int16',
+        'win': 'Int16', 'draw': 'Int16', 'lose': 'Int16', 'goals_diff': 'Int16', 'goals_for': 'Int16',
+        'goals_against': 'Int16', 'national_rank': 'Int16',
+    },
+    'distance_data': {
+        'team_name': 'category', 'opponent_name': 'category', 'team_city': 'category',
+        'opponent_city': 'category', 'distance': 'float64',
+    },
+    'financial_data': {
+        'year': 'int16', 'league': 'category', 'team_name': 'category', 'team_size': 'int16',
+        'mean_age': 'float64', 'foreigners': 'int16', 'mean_value': 'float64', 'total_value': 'float64',
+    },
+    'injuries_fixture': {
+        'year': 'int16', 'team_id': 'int32', 'fixture_id': 'int32', 'fixture_date': 'datetime',
+        'missing_players': 'int16', 'questionable_players': 'int16',
+    },
+    'injuries_season': {
+        'year': 'int16', 'team_id': 'int32', 'injury_fixtures': 'int16', 'missing_players_season': 'int16',
+        'questionable_players_season': 'int16',
+    },
+    'congestion': {
+        'competition': 'category', 'year': 'int16', 'fixture_date': 'datetime', 'team_id': 'int32',
+        'opponent_id': 'int32',
+    },
+    'ratings': {
+        'year': 'int16', 'fixture_date': 'datetime', 'home_id': 'int32', 'away_id': 'int32',
+        'competition': 'category', 'home_score': 'float64', 'home_rating': 'float64', 'away_rating': 'float64',
+    },
+    'processed': {
+        'year': 'int16', 'round': 'category', 'stage': 'int8', 'fixture_id': 'int32', 'fixture_date': 'datetime',
+        'team_name': 'category', 'team_id': 'int32', 'opponent_name': 'category', 'opponent_id': 'int32',
+        'team_key': 'int32', 'opponent_key': 'int32', 'team_win': 'int8', 'team_home': 'int8',
+        'fixture_length': 'int16', 'fixture_location': 'category', 'team_max_stage': 'int8',
+        'next_fixture_date_round': 'datetime', 'next_fixture_date_round_plus': 'datetime', 'city': 'category',
+        'league': 'category', 'extra_time': 'int8',
+    },
+}
+
+
+def apply_schema(df, schema):
+    """
+    Cast the columns of `df` that the schema declares. Dates are parsed to UTC timestamps.
+
+    Returns:
+    - pd.DataFrame: The typed dataframe.
+    """
+    df = df.copy()
+    for column, dtype in SCHEMAS[schema].items():
+        if column not in df.columns:
+            continue
+        if dtype == 'datetime':
+            df[column] = pd.to_datetime(df[column], utc=True)
+        elif dtype.startswith('int') and df[column].isna().any():
+            df[column] = df[column].astype(dtype.capitalize())
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def parquet_path(file_path):
+    """
+    Parquet file of a table, the table path with a .parquet suffix, e.g. league_standings.csv -> .parquet.
+    """
+    return f'{os.path.splitext(file_path)[0]}.parquet'
+
+
+def csv_path(file_path):
+    return f'{os.path.splitext(file_path)[0]}.csv'
+
+
+def save_table(df, file_path, schema, export_csv=False):
+    """
+    Save a data/process table as typed Parquet and, with `export_csv`, also as CSV for scripts
+    that read the CSV directly. The CSV is written from the values as given, so its format
+    (e.g. ISO dates with a 'T') stays the same as before the typed Parquet files.
+
+    Returns:
+    - pd.DataFrame: The typed dataframe.
+    """
+    if export_csv:
+        save_csv(df, file_path)
+    else:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    df = apply_schema(df, schema)
+    df.to_parquet(parquet_path(file_path), index=False)
+    return df
+
+
+def save_csv(df, file_path):
+    """
+    Export a table as CSV only, for views of data that is stored once elsewhere, such as the
+    team-centric fixtures of the compact *_matches.parquet tables.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    df.to_csv(csv_path(file_path), index=False)
+
+
+def table_exists(file_path):
+    return os.path.isfile(parquet_path(file_path)) or os.path.isfile(csv_path(file_path))
+
+
+def read_table(file_path, columns=None):
+    """
+    Read a table from its Parquet file or its CSV, whichever was written last. The CSV only wins
+    when it changed after the Parquet file, e.g. through a git pull of a tracked CSV, and a
+    message says so. With `columns` only those columns are read.
+
+    Returns:
+    - pd.DataFrame: The table.
+    """
+    typed_path, text_path = parquet_path(file_path), csv_path(file_path)
+    if os.path.isfile(typed_path):
+        if not os.path.isfile(text_path) or os.path.getmtime(typed_path) >= os.path.getmtime(text_path):
+            return pd.read_parquet(typed_path, columns=columns)
+        print(f"{text_path} is newer than {typed_path}, reading the CSV")
+    return pd.read_csv(text_path, usecols=columns)